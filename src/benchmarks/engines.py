@@ -0,0 +1,48 @@
+"""
+Time of the reference interpreter, of the bytecode and of the compiled programs.
+
+Run from the src directory with ``python -m benchmarks.engines``. Every
+program is parsed and checked once, then evaluated on ordinals with the
+Interpreter, a VirtualMachine and a CompiledProgram, assembling and
+compilation included.
+"""
+import argparse
+import time
+
+from tabulate import tabulate
+
+from zerkel.interpreter import (
+    parse, check, Interpreter, CompiledProgram, VirtualMachine
+)
+
+
+def run(engine, node, args, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine(node).interpret(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    cases = [('add', (10, 10)), ('add', (50, 50)), ('mult', (5, 5)),
+             ('mult', (12, 12)), ('power', (2, 5))]
+    rows = []
+    for program, arguments in cases:
+        node = parse(program)
+        check(node)
+        interpreted = run(Interpreter, node, arguments, args.repeat)
+        vm = run(VirtualMachine.from_node, node, arguments, args.repeat)
+        compiled = run(CompiledProgram, node, arguments, args.repeat)
+        rows.append([program, arguments, interpreted, vm, compiled, interpreted / compiled])
+    headers = ['program', 'arguments', 'interpreter (s)', 'vm (s)', 'compiled (s)', 'speedup']
+    print(tabulate(rows, headers,
+                   floatfmt='.4f', tablefmt='fancy_grid'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Throughput of Set and Node interning with several threads.
+
+Run from the src directory with ``python -m benchmarks.interning``. Every
+thread interns its own fresh sets (misses, which take a lock) then looks
+up sets interned by every thread (hits, which do not). With the GIL the
+throughput does not grow with the number of threads, on a free-threaded
+build it should.
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tabulate import tabulate
+
+from zerkel.core import Set, Identity, UnionPlus, Composition, Projection
+
+
+def misses(seed: int, n: int) -> Set:
+    base = Set.generate_singleton(seed)
+    x = Set()
+    for _ in range(n):
+        x = Set(x, base)
+    return x
+
+
+def hits(n: int) -> int:
+    found = 0
+    for i in range(n):
+        found += len(Set.generate(i % 4096))
+    return found
+
+
+def nodes(n: int) -> int:
+    successor = Composition(UnionPlus(), Identity(), Identity())
+    for i in range(n):
+        Projection(Composition(successor, successor), i % 8, 0)
+    return n
+
+
+def run(threads: int, work, n: int, offset: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        if work is misses:
+            results = list(pool.map(misses, range(offset, offset + threads), [n] * threads))
+        else:
+            results = list(pool.map(work, [n] * threads))
+    elapsed = time.perf_counter() - start
+    del results
+    return threads * n / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-n', type=int, default=100000, help='operations per thread')
+    parser.add_argument('-t', '--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+    # Kept alive so that looking them up again always hits.
+    warm = Set.generate_many(0, 4096)
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    rows = []
+    for i, threads in enumerate(args.threads):
+        offset = 1000 * (i + 1)
+        rows.append([threads,
+                     run(threads, misses, args.n, offset),
+                     run(threads, hits, args.n, offset),
+                     run(threads, nodes, args.n, offset)])
+        Set.clear_cache()
+    print(f'Python {sys.version.split()[0]}, GIL {"enabled" if gil else "disabled"}')
+    print(tabulate(rows, ['threads', 'set misses/s', 'set hits/s', 'nodes/s'],
+                   floatfmt='.0f', tablefmt='fancy_grid'))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,35 @@
+import gc
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import zerkel
 from zerkel import *
-from zerkel.interpreter.parser import ParseException
-from zerkel.interpreter.semantic_analyzer import OneCompoundMismatchedArity
-from zerkel.interpreter.interpreter import MismatchedNumberOfArguments
+from zerkel.core.node import Printer, ascii_printer
+from zerkel.interpreter.parser import ParseException, macro_name
+from zerkel.interpreter.semantic_analyzer import (
+    OneCompoundMismatchedArity, used_arguments, strict_arguments
+)
+from zerkel.interpreter.interpreter import AtomicStepCounter, MismatchedNumberOfArguments
+
+
+def assert_same_results(test: unittest.TestCase, run):
+    """Compares the evaluation of programs, run(node) being a function of
+    the arguments, with the lazy Interpreter on every combination of the
+    arguments."""
+    arguments = [Set.generate(i) for i in range(8)]
+    for program in ('o+II', 'R+', '<I', 'Ro+<I>I', 'Ro?<<<E>>I<>I<<I', 'predecessor',
+                    'rank', 'is ordinal', 'add', 'get first', 'get second'):
+        node = zerkel.parse(program)
+        evaluate = run(node)
+        for args in itertools.product(arguments, repeat=node.arity):
+            expected = Interpreter(node).interpret(*args)
+            test.assertEqual(expected, evaluate(*args), (program, args))
 
 
 class TestSet(unittest.TestCase):
@@ -55,6 +80,25 @@ class TestSet(unittest.TestCase):
         )
         self.assertEqual(expected, s)
 
+    def test_parse_errors(self):
+        # The column of the first unexpected character, even when nested.
+        for text, col in (('{1 2}', 3), ('(1)', 2), ('<a>', 1), ('{', 1),
+                          ('{1, }', 4), ('(0, 1', 5), ('{1,,2}', 3),
+                          ('{{1,}}', 4), ('{2, {3, x}}', 8)):
+            with self.assertRaises(SetParsingException) as context:
+                Set.parse(text)
+            self.assertEqual(col, context.exception.col)
+
+    def test_parse_deep(self):
+        s = Set.parse('{' * 3000 + '}' * 3000)
+        self.assertEqual(Set.generate_singleton(2999), s)
+
+    def test_parse_many(self):
+        sets = Set.parse_many('0, {1}\n<5> (1, 2)\n')
+        expected = [Set(), Set.parse('{{0}}'), Set.generate(5), Set.parse('(1, 2)')]
+        self.assertEqual(expected, sets)
+        self.assertEqual([], Set.parse_many(''))
+
     def test_generate_set(self):
         s = Set.parse('<15>')
         self.assertEqual(Set.generate(15), s)
@@ -77,6 +121,22 @@ class TestSet(unittest.TestCase):
         e = (Set(), Set(Set()), Set(Set(Set())))
         self.assertEqual(e, tuple(g))    
                 
+    def test_generate_range(self):
+        expected = [Set.generate(i) for i in range(100, 3, -7)]
+        self.assertEqual(expected, list(Set.generate_range(100, 3, -7)))
+        self.assertEqual([], list(Set.generate_range(5, 5)))
+
+    def test_generate_many(self):
+        expected = [Set.generate(i) for i in range(1000, 3000)]
+        self.assertEqual(expected, Set.generate_many(1000, 3000))
+
+    def test_generate_transitive(self):
+        e = (Set.parse('0'), Set.parse('1'), Set.parse('2'),
+             Set.parse('{0, 1, {1}}'), Set.parse('3'))
+        a = tuple(Set.generate_transitive(5))
+        self.assertEqual(e, a)
+        self.assertTrue(all(s.is_transitive for s in Set.generate_transitive(50)))
+
     def test_generate_complete(self):
         s = Set.generate_complete(0)
         self.assertEqual(Set.parse('{0}'), s)
@@ -109,6 +169,462 @@ class TestSet(unittest.TestCase):
         a = tuple(Set.generate_rank(3))
         self.assertEqual(e, a)
 
+    def test_generate_rank_slice(self):
+        a = tuple(Set.generate_rank(3))
+        self.assertEqual(a[4:7], tuple(Set.generate_rank(3, 4, 7)))
+
+    def test_index_of(self):
+        for rank in range(5):
+            for i, s in enumerate(Set.generate_rank(rank, 0, 20)):
+                self.assertEqual(i, Set.index_of(s))
+                self.assertIs(s, Set.set_at(rank, i))
+
+    def test_set_at_large_rank(self):
+        s = Set.set_at(6, 123456789)
+        self.assertEqual(6, s.rank)
+        self.assertEqual(123456789, Set.index_of(s))
+        self.assertRaises(IndexError, Set.set_at, 2, 2)
+        self.assertRaises(IndexError, Set.set_at, 2, -1)
+
+    def test_to_string(self):
+        s = Set.parse('{{{1}}, {0, {{1}}}, {{{1}}, 5}}')
+        self.assertEqual('{{{1}}, {0, {{1}}}, {{{1}}, 5}}', s.to_string())
+        self.assertEqual('{{...}, {...}, {...}}', s.to_string(max_depth=1))
+        self.assertEqual('{{{1}}, ...}', s.to_string(max_elements=1))
+        self.assertEqual('{{{1}}, {0...', s.to_string(max_chars=10))
+        self.assertEqual('{#1={{1}}, {0, #1#}, {#1#, 5}}', s.to_string(share=True))
+        self.assertEqual('(1, 2)', Set.parse('(1, 2)').to_string(format_tuple=True))
+
+    def test_to_string_shared(self):
+        s = Set()
+        for _ in range(5000):
+            s = Set(s, Set(s))
+        self.assertLess(len(s.to_string(share=True)), 200000)
+        self.assertEqual('{{{...}, {...}}, {{...}}}', s.to_string(max_depth=2))
+
+    def test_as_tree_bounds(self):
+        s = Set.generate(1 << 20)
+        self.assertEqual(s.as_tree(), s.as_tree(max_depth=10, max_elements=10))
+        lines = Set.generate(20).as_tree(max_depth=1, max_elements=1).splitlines()
+        self.assertIn('…', lines[5])
+        self.assertIn('+1', lines[3])
+
+    def test_code(self):
+        self.assertEqual(0, Set().code)
+        self.assertEqual(14, Set.parse('{1, 2, {1}}').code)
+        self.assertIs(Set.parse('{1, 2, {1}}'), Set.generate(14))
+
+    def test_contains(self):
+        s = Set.parse('{0, 2}')
+        self.assertTrue(s.contains(Set.parse('2')))
+        self.assertFalse(s.contains(Set.parse('1')))
+        self.assertFalse(s.contains(Set.generate_ordinal(7)))
+
+    def test_adjoin(self):
+        self.assertIs(Set.parse('{0, 2}'), Set.parse('{0}').adjoin(Set.parse('2')))
+        big = Set.generate_ordinal(7)
+        self.assertIsNone(big.code)
+        self.assertEqual(Set.generate_ordinal(8), big.adjoin(big))
+
+    def test_union(self):
+        self.assertIs(Set.parse('3'), Set.union(Set.parse('{0, 2}'), Set.parse('{1}')))
+
+    def test_deep_properties(self):
+        s = Set.generate_singleton(5000)
+        self.assertEqual(5000, s.rank)
+        self.assertEqual(5001, s.size)
+        self.assertIsNone(s.ordinal)
+        self.assertFalse(s.is_transitive)
+        self.assertLess(Set.generate_singleton(4999), s)
+        o = Set.generate_ordinal(1500)
+        self.assertEqual(1500, o.ordinal)
+        self.assertTrue(o.is_transitive)
+
+    def test_order_matches_value(self):
+        sets = list(Set.generate_all(300))
+        self.assertEqual(sets, sorted(reversed(sets)))
+
+    def test_sort_key(self):
+        sets = [Set.generate_ordinal(i) for i in range(10)]
+        sets.append(Set(Set.generate_ordinal(7), Set.generate_ordinal(3)))
+        shuffled = sets[7:] + sets[:7]
+        expected = sets[:8] + [sets[10], sets[8], sets[9]]
+        self.assertEqual(expected, sorted(shuffled, key=lambda s: s.sort_key))
+        self.assertEqual(expected, sorted(shuffled))
+
+    def test_cache_keeps_live_sets(self):
+        s = Set.generate_ordinal(42)
+        Set.clear_cache()
+        self.assertIs(s, Set.generate_ordinal(42))
+
+    def test_cache_releases_unreferenced_sets(self):
+        key = Set.generate_singleton(37).elements
+        Set.clear_cache()
+        self.assertNotIn(key, Set.cache)
+
+    def test_digest(self):
+        self.assertEqual(16, len(Set().digest))
+        self.assertEqual(Set.parse('{0, 2}').digest, Set.parse('{2, 0}').digest)
+        self.assertNotEqual(Set.parse('{0, 2}').digest, Set.parse('{0, 1}').digest)
+        self.assertEqual(16, len(Set.generate_singleton(5000).digest))
+
+    def test_digest_is_stable_across_processes(self):
+        code = ('from zerkel import *; '
+                'print(Set.generate(123456).digest.hex(), parse("add").digest.hex())')
+        expected = f'{Set.generate(123456).digest.hex()} {parse("add").digest.hex()}\n'
+        for seed in ('1', '2'):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            output = subprocess.check_output([sys.executable, '-c', code], env=env,
+                                             cwd=os.path.dirname(os.path.dirname(__file__)))
+            self.assertEqual(expected.encode(), output)
+
+    def test_concurrent_interning(self):
+        def build(_):
+            x = Set.generate_singleton(12345)
+            for _ in range(2000):
+                x = Set(x, Set(x))
+            return x
+
+        with ThreadPoolExecutor(8) as pool:
+            first, *others = pool.map(build, range(8))
+        for other in others:
+            self.assertIs(first, other)
+
+    def test_intern_table_stats(self):
+        table = InternTable(maxsize=1)
+        a, b = Set.generate_ordinal(3), Set.generate_ordinal(4)
+        table.add('a', a)
+        table.add('b', b)
+        self.assertIs(a, table.get('a'))
+        self.assertIsNone(table.get('c'))
+        stats = table.stats()
+        self.assertEqual((1, 1, 2, 1, 1), stats[:5])
+        self.assertGreater(stats.bytes, 0)
+
+    def test_intern_table_removal_under_lock(self):
+        class Holder:
+            pass
+
+        table = InternTable(maxsize=0, stripes=1)
+        held, release = threading.Event(), threading.Event()
+
+        def hold():
+            with table.lock('a'):
+                held.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        held.wait()
+        # The value dies right away, its removal must not wait for the lock.
+        table.add('a', Holder())
+        self.assertTrue(thread.is_alive())
+        release.set()
+        thread.join()
+        self.assertNotIn('a', table)
+        self.assertEqual(0, table.stats().live)
+
+    def test_intern_table_stats_during_collection(self):
+        class Holder:
+            pass
+
+        class CollectingDict(dict):
+            # Collects in the middle of any iteration, as an allocation may.
+            def _collect(self, items):
+                for i, item in enumerate(items):
+                    if i == 1:
+                        gc.collect()
+                    yield item
+
+            def items(self):
+                return self._collect(super().items())
+
+            def values(self):
+                return self._collect(super().values())
+
+            def __iter__(self):
+                return self._collect(super().__iter__())
+
+        table = InternTable(maxsize=0)
+        table._data = CollectingDict()
+        alive = [table.add(i, Holder()) for i in range(10)]
+        for i in range(10, 100):
+            holder = table.add(i, Holder())
+            holder.cycle = holder
+        del holder
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.assertGreaterEqual(table.stats().live, 10)
+            self.assertGreaterEqual(len(list(table.values())), 10)
+        finally:
+            if enabled:
+                gc.enable()
+        gc.collect()
+        self.assertEqual(10, table.stats().live)
+        self.assertEqual(alive, list(table.values()))
+
+
+class TestKernel(unittest.TestCase):
+    def test_transitive_closure(self):
+        x = Set.parse('{{{1}}}')
+        self.assertEqual(Set.parse('{0, 1, {1}, {{1}}}'), transitive_closure(x))
+
+    def test_closure(self):
+        x = Set.parse('{{1}}')
+        self.assertEqual(zerkel.interpret('R+', x), closure(x))
+
+    def test_rank_set(self):
+        self.assertEqual(Set.parse('3'), rank_set(Set.generate(14)))
+
+    def test_big_union(self):
+        self.assertEqual(Set.parse('{0, 1, {1}}'), big_union(Set.parse('{2, {{1}}}')))
+
+    def test_well_founded_is_iterative(self):
+        depth = WellFounded(lambda a, x: a.adjoin(a))
+        self.assertEqual(Set.generate_ordinal(3001), depth(Set.generate_singleton(3000)))
+
+    def test_well_founded_cache(self):
+        f = WellFounded(lambda a, x: Set.union(a, x), maxsize=2)
+        f(Set.generate_ordinal(5))
+        self.assertEqual(2, len(f.cache))
+        self.assertEqual(Set.generate_ordinal(5), f(Set.generate_ordinal(5)))
+
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.zset')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_dump_and_load(self):
+        sets = [Set.generate_ordinal(i) for i in range(20)] + [Set.generate(14)]
+        dump_sets(sets, self.path)
+        self.assertEqual(sets, load_sets(self.path))
+
+    def test_shared_sub_sets_written_once(self):
+        dump_sets([Set.generate_ordinal(50)], self.path)
+        self.assertLess(os.path.getsize(self.path), 8 * 51 + 4 * 50 * 51)
+
+    def test_random_access(self):
+        sets = list(Set.generate_range(1000, 1100))
+        dump_sets(sets, self.path)
+        with SetFile(self.path) as f:
+            self.assertEqual(100, len(f))
+            self.assertIs(sets[42], f[42])
+            self.assertIs(sets[-1], f[-1])
+            self.assertRaises(IndexError, f.__getitem__, 100)
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a set file at all, really not')
+        self.assertRaises(SetFileException, load_sets, self.path)
+
+    def test_corrupted_file(self):
+        dump_sets([Set.generate_ordinal(3)], self.path)
+        with open(self.path, 'rb') as f:
+            data = bytearray(f.read())
+        # The first element of the set 3 is the set 0, make it the set 3 itself.
+        position = len(data) - 8 - 4 * 3
+        self.assertEqual(0, data[position])
+        data[position] = 3
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        self.assertRaises(ValueError, load_sets, self.path)
+        with SetFile(self.path) as f:
+            self.assertRaises(ValueError, f.__getitem__, 0)
+
+
+class TestArena(unittest.TestCase):
+    def test_interning(self):
+        arena = SetArena(capacity=1)
+        ids = [arena.from_set(Set.generate(i)) for i in range(300)]
+        self.assertEqual(ids, [arena.from_set(Set.generate(i)) for i in range(300)])
+        self.assertEqual(300, len(frozenset(ids)))
+        for i, x in enumerate(ids):
+            self.assertIs(Set.generate(i), arena.to_set(x))
+
+    def test_properties(self):
+        arena = SetArena()
+        for s in Set.generate_many(0, 1000):
+            x = arena.from_set(s)
+            self.assertEqual(s.rank, arena.rank(x))
+            self.assertEqual(len(s), arena.cardinal(x))
+            self.assertEqual(s.ordinal, arena.ordinal(x))
+
+    def test_operations(self):
+        arena = SetArena()
+        x, y = arena.from_set(Set.parse('{0, 2}')), arena.generate_ordinal(1)
+        self.assertTrue(arena.contains(x, arena.generate_ordinal(2)))
+        self.assertFalse(arena.contains(x, y))
+        self.assertEqual(arena.generate_ordinal(3), arena.adjoin(x, y))
+        self.assertEqual(arena.from_set(Set.parse('{0, 1, 2}')),
+                         arena.union(x, arena.from_set(Set.parse('{1}'))))
+
+    def test_interpret(self):
+        arena = SetArena()
+        i = Interpreter(parse('add'), arena)
+        self.assertEqual(arena.generate_ordinal(5), i.interpret(2, 3))
+        self.assertEqual(Set.generate_ordinal(5), arena.to_set(i.interpret(2, 3)))
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.sets = [*Set.generate_many(0, 3000), Set.parse('(1, 2)'),
+                     Set.parse('(3, 3)'), Set.generate_ordinal(30),
+                     Set.generate_singleton(2000)]
+
+    def test_properties(self):
+        batch = SetBatch(self.sets)
+        self.assertEqual([s.rank for s in self.sets], batch.ranks().tolist())
+        self.assertEqual([len(s) for s in self.sets], batch.cardinals().tolist())
+        self.assertEqual([-1 if s.ordinal is None else s.ordinal for s in self.sets],
+                         batch.ordinals().tolist())
+        self.assertEqual([s.is_transitive for s in self.sets],
+                         batch.transitivity().tolist())
+        self.assertEqual([s.is_tuple for s in self.sets], batch.tuples().tolist())
+
+    def test_arena(self):
+        arena = SetArena()
+        ids = [arena.from_set(s) for s in self.sets]
+        for f in (ranks, cardinals, ordinals, transitivity, tuples):
+            self.assertEqual(f(self.sets).tolist(), f(ids, arena).tolist())
+
+    def test_empty(self):
+        self.assertEqual([0], ordinals([Set()]).tolist())
+        self.assertEqual([False], tuples([Set()]).tolist())
+        self.assertEqual(0, len(ranks([])))
+
+
+class TestTable(unittest.TestCase):
+    def test_arguments_from_text(self):
+        t = zerkel.table('add', '0 1 2', '3, 4')
+        self.assertEqual(Set.generate_ordinal(6), t.table[2][1])
+
+    def test_arena(self):
+        arena = SetArena()
+        t = zerkel.table('add', range(3), range(3))
+        a = zerkel.table('add', range(3), range(3), arena=arena)
+        self.assertEqual(arena.generate_ordinal(4), a.table[2][2])
+        self.assertEqual(str(t), str(a))
+
+
+class TestNode(unittest.TestCase):
+    def test_hash_consing(self):
+        self.assertIs(parse('o+II'), parse('successor'))
+        self.assertIs(Projection(Identity(), 1, 0), parse('<I'))
+        self.assertIsNot(parse('<I'), parse('>I'))
+
+    def test_ids(self):
+        a, b = parse('<I'), parse('>I')
+        self.assertNotEqual(a.id, b.id)
+        self.assertEqual(hash(a), a.id)
+
+    def test_cache_releases_unreferenced_nodes(self):
+        key = (Projection, Identity(), 17, 23)
+        Projection(Identity(), 17, 23)
+        self.assertIn(key, Node.cache)
+        Node.clear_cache()
+        self.assertNotIn(key, Node.cache)
+        self.assertEqual(Node.cache_stats().live, len(Node.cache))
+
+    def test_print(self):
+        text = 'oRo?<>oo+<EIo+II>>I<>I<<III'
+        self.assertEqual(text, str(parse(text)))
+        self.assertEqual('(R?)', str(Function(parse('R?'), None)))
+
+    def test_print_deep(self):
+        node = Identity()
+        for _ in range(20000):
+            node = Composition(UnionPlus(), node, Identity())
+        text = str(node)
+        self.assertEqual('o+' * 20000 + 'I' * 20001, text)
+        self.assertEqual('o+' + text + text, str(Composition(UnionPlus(), node, node)))
+        with tempfile.TemporaryFile('w+') as f:
+            ascii_printer.dump(Recursion(node), f, buffer=16)
+            f.seek(0)
+            self.assertEqual('R' + text, f.read())
+
+    def test_print_shared(self):
+        # A Printer of its own, the texts kept by other tests do not matter.
+        printer = Printer('E', 'I', '+', '?', '!', '<', '>', 'o', 'R', 'U', 'M')
+        shared = Composition(IfThenElse(), *[Projection(Identity(), i, 3 - i) for i in range(4)])
+        text = printer.print(Composition(UnionPlus(), shared, EmptySet()))
+        self.assertEqual('o+o?>>>I<>>I<<>I<<<IE', text)
+        # The text of a node printed inside another one is kept.
+        self.assertIs(printer.print(shared), printer.print(shared))
+        self.assertEqual('o+' + str(shared) * 2,
+                         printer.print(Composition(UnionPlus(), shared, shared)))
+        # Unlike the text of a large node, written again every time.
+        node = shared
+        for _ in range(printer.cache_limit):
+            node = Composition(UnionPlus(), node, shared)
+        text = printer.print(node)
+        self.assertEqual('o+' * printer.cache_limit + str(shared) * (printer.cache_limit + 1), text)
+        self.assertIsNot(text, printer.print(node))
+        self.assertIs(printer.print(shared), printer.print(shared))
+
+    def test_print_threads(self):
+        programs, expected = [], []
+        for leaf in (EmptySet(), Identity(), Projection(Identity(), 1, 0), UnionPlus()):
+            node = leaf
+            for _ in range(5000):
+                node = Composition(UnionPlus(), node, leaf)
+            programs.append(node)
+            expected.append('o+' * 5000 + str(leaf) * 5001)
+        with ThreadPoolExecutor(4) as executor:
+            self.assertEqual(expected, list(executor.map(str, programs)))
+
+    def test_digest(self):
+        self.assertNotEqual(parse('<I').digest, parse('>I').digest)
+        self.assertNotEqual(parse('o+<EI').digest, parse('o+>EI').digest)
+        node = Identity()
+        for _ in range(20000):
+            node = Composition(UnionPlus(), node, Identity())
+        self.assertEqual(16, len(node.digest))
+
+    def test_scoped_intrinsics(self):
+        intrinsics = compile_functions()
+        self.assertIsInstance(parse('R?'), Recursion)
+        node = parse('R?')
+        plain, fast = StepCounter(), StepCounter()
+        i, j = Interpreter(node), Interpreter(node, intrinsics=intrinsics)
+        i.add_observer(plain)
+        j.add_observer(fast)
+        self.assertIs(i.interpret(2, 3, 4), j.interpret(2, 3, 4))
+        self.assertLess(fast.steps, plain.steps)
+
+
+class TestCodec(unittest.TestCase):
+    programs = ['oRo?<>oo+<EIo+II>>I<>I<<III', 'R!<<E+', '<<>>>I', 'add', 'is pair']
+
+    def test_round_trip(self):
+        for text in self.programs:
+            node = parse(text)
+            self.assertIs(node, decode(encode(node)))
+
+    def test_shared_sub_programs(self):
+        node = Identity()
+        for _ in range(10000):
+            node = Composition(UnionPlus(), node, node)
+        data = encode(node)
+        self.assertLess(len(data), 10 * 10000)
+        self.assertIs(node, decode(data))
+
+    def test_stream(self):
+        nodes = [parse(text) for text in self.programs]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'programs.zprg')
+            dump_programs(nodes * 2, path)
+            self.assertEqual(nodes * 2, load_programs(path))
+
+    def test_errors(self):
+        self.assertRaises(CodecException, encode, Function(parse('R?'), None))
+        self.assertRaises(CodecException, decode, encode(parse('add'))[:-1])
+        self.assertRaises(CodecException, decode, bytes([42]))
+
 
 class TestParser(unittest.TestCase):
     def test_successor(self):
@@ -147,6 +663,21 @@ class TestSemanticAnalyzer(unittest.TestCase):
         ast = zerkel.parse('o+I<I')
         self.assertRaises(OneCompoundMismatchedArity, zerkel.check, ast)
 
+    def test_used_arguments(self):
+        self.assertEqual({1}, used_arguments(zerkel.parse('<I')))
+        self.assertEqual({0, 2}, used_arguments(zerkel.parse('o+<<I>>I')))
+        self.assertEqual({0, 1, 2, 3}, used_arguments(zerkel.parse('?')))
+        # The condition is skipped when both branches are the same.
+        self.assertEqual(frozenset(), strict_arguments(zerkel.parse('?')))
+        self.assertEqual(frozenset(), strict_arguments(zerkel.parse('o?<I<I<I>I')))
+        self.assertEqual({0, 1}, strict_arguments(zerkel.parse('o?<I>I<I>I')))
+        # The union of the recursive calls, first argument of g, is only
+        # needed when the second argument is not in the third one.
+        g = zerkel.parse('o?<<<E>>I<>I<<I')
+        self.assertEqual({0, 1, 2}, used_arguments(g))
+        self.assertEqual({1, 2}, strict_arguments(g))
+        self.assertEqual({0, 1}, used_arguments(Recursion(g)))
+
 
 class TestInterpreter(unittest.TestCase):
     def test_too_many_arguments(self):
@@ -306,6 +837,282 @@ class TestInterpreter(unittest.TestCase):
         result = zerkel.interpret(ast, 2, 4)
         self.assertEqual(Set.generate_ordinal(2 ** 4), result)
 
+    def test_strict_strategy(self):
+        assert_same_results(self, lambda node: Interpreter(node, strategy='strict').interpret)
+
+    def test_strict_strategy_steps(self):
+        steps = []
+        for strategy in ('lazy', 'strict'):
+            interpreter = Interpreter(zerkel.parse('mult'), strategy=strategy)
+            counter = StepCounter()
+            interpreter.add_observer(counter)
+            self.assertEqual(Set.generate_ordinal(12), interpreter.interpret(3, 4))
+            steps.append(counter.steps)
+        self.assertLess(steps[1], steps[0])
+        self.assertRaises(ValueError, Interpreter, zerkel.parse('o+II'), strategy='eager')
+        # The condition of an IfThenElse with the same branches is skipped.
+        branch = Projection(Identity(), 1, 0)
+        node = Composition(IfThenElse(), branch, branch, zerkel.parse('mult'), Projection(Identity(), 0, 1))
+        steps = []
+        for strategy in ('lazy', 'strict'):
+            interpreter = Interpreter(node, strategy=strategy)
+            counter = StepCounter()
+            interpreter.add_observer(counter)
+            self.assertEqual(Set.generate_ordinal(3), interpreter.interpret(6, 3))
+            steps.append(counter.steps)
+        self.assertLessEqual(steps[1], steps[0])
+        self.assertLess(steps[0], 20)
+        # Neither is the last argument of an In with the same branches.
+        mult = Composition(zerkel.parse('mult'), Identity(), Identity())
+        node = Composition(zerkel.parse('!>I>I'), Identity(), mult)
+        steps = []
+        for strategy in ('lazy', 'strict', 'bottom_up'):
+            interpreter = Interpreter(node, strategy=strategy)
+            counter = StepCounter()
+            interpreter.add_observer(counter)
+            self.assertEqual(Set.generate_ordinal(12), interpreter.interpret(12))
+            steps.append(counter.steps)
+        self.assertLessEqual(steps[1], steps[0])
+        self.assertLess(steps[0], 20)
+
+    def test_bottom_up_strategy(self):
+        assert_same_results(self, lambda node: Interpreter(node, strategy='bottom_up').interpret)
+        steps = []
+        for strategy in ('lazy', 'bottom_up'):
+            interpreter = Interpreter(zerkel.parse('R+'), strategy=strategy)
+            counter = StepCounter()
+            interpreter.add_observer(counter)
+            self.assertEqual(Set.generate_ordinal(51), interpreter.interpret(50))
+            steps.append(counter.steps)
+        self.assertLess(steps[1], steps[0])
+
+    def test_compare_strategies(self):
+        node = zerkel.parse('add')
+        c = zerkel.compare(node, node, [1, 2], [3], strategies=('lazy', 'strict'))
+        self.assertEqual((2, 1), c.benchmark1.times.shape)
+        self.assertIn('(strict)', c.format())
+
+
+class TestMemo(unittest.TestCase):
+    def tearDown(self):
+        shared_memo().clear()
+
+    def test_same_results(self):
+        memo = ResultMemo(64)
+        node = zerkel.parse('mult')
+        for a in range(5):
+            for b in range(5):
+                result = Interpreter(node, memo=memo).interpret(a, b)
+                self.assertEqual(Set.generate_ordinal(a * b), result)
+        self.assertLessEqual(len(memo), 64)
+        self.assertGreater(memo.stats().evictions, 0)
+
+    def test_shared_between_interpreters(self):
+        memo = ResultMemo()
+        node = zerkel.parse('add')
+        steps = []
+        for _ in range(2):
+            interpreter = Interpreter(node, memo=memo)
+            counter = StepCounter()
+            interpreter.add_observer(counter)
+            self.assertEqual(Set.generate_ordinal(5), interpreter.interpret(3, 2))
+            steps.append(counter.steps)
+        self.assertEqual(1, steps[1])
+        self.assertGreater(memo.hit_rate(), 0)
+
+    def test_shared_memo(self):
+        self.assertEqual(Set.generate_ordinal(6), zerkel.interpret('mult', 2, 3, memo=True))
+        self.assertGreater(len(shared_memo()), 0)
+        t = zerkel.table('add', [1, 2], [1, 2], memo=True)
+        self.assertEqual(Set.generate_ordinal(4), t.table[1][1])
+        self.assertGreater(shared_memo().hits, 0)
+
+    def test_benchmark(self):
+        memo = ResultMemo()
+        memoized = zerkel.benchmark('add', [1, 2], [1, 2], iterations=2, memo=memo)
+        plain = zerkel.benchmark('add', [1, 2], [1, 2], iterations=2)
+        self.assertTrue((memoized.table < plain.table).all())
+        self.assertTrue((memoized.times > 0).all())
+        # The runs timed without observers use a copy of the memo.
+        copy = memo.copy()
+        self.assertEqual(len(memo), len(copy))
+        self.assertEqual(0, copy.hits)
+
+    def test_arena_is_not_memoized(self):
+        memo = ResultMemo()
+        arena = SetArena()
+        Interpreter(zerkel.parse('add'), arena, memo=memo).interpret(1, 1)
+        self.assertEqual(0, len(memo))
+
+
+class TestProfiler(unittest.TestCase):
+    def test_macro_names(self):
+        self.assertEqual('mult', macro_name(zerkel.parse('mult')))
+        self.assertEqual('not equal', macro_name(zerkel.parse('not equal')))
+        self.assertIsNone(macro_name(zerkel.parse('o+<I>I')))
+
+    def test_every_steps(self):
+        interpreter = Interpreter(zerkel.parse('mult'))
+        profiler, counter = SamplingProfiler(every=10), StepCounter()
+        interpreter.add_observer(profiler)
+        interpreter.add_observer(counter)
+        interpreter.interpret(3, 3)
+        self.assertEqual(counter.steps // 10, profiler.samples)
+        macros = {name: total for name, _, _, total in profiler.by_macro()}
+        self.assertEqual(1.0, macros['mult'])
+        self.assertIn('add', macros)
+        self.assertEqual(profiler.samples, sum(n for _, n, _ in profiler.by_node()))
+        self.assertIn('mult', profiler.report())
+
+    def test_timer(self):
+        profiler = zerkel.profile('mult', 6, 6, interval=0.001)
+        self.assertIsNone(profiler._thread)
+        self.assertEqual(sum(profiler.macros.values()), profiler.samples)
+
+
+class TestBudget(unittest.TestCase):
+    def test_steps(self):
+        node = zerkel.parse('mult')
+        interpreter, counter = Interpreter(node), StepCounter()
+        interpreter.add_observer(counter)
+        interpreter.interpret(3, 3)
+        steps = counter.steps
+        self.assertEqual(Set.generate_ordinal(9),
+                         Interpreter(node).interpret(3, 3, budget=Budget(steps=steps)))
+        with self.assertRaises(BudgetExceeded) as context:
+            Interpreter(node).interpret(3, 3, budget=Budget(steps=steps - 1))
+        self.assertEqual('steps', context.exception.resource)
+        self.assertEqual(steps - 1, context.exception.steps)
+        self.assertIn('steps budget of', str(context.exception))
+
+    def test_seconds_and_sets(self):
+        with self.assertRaises(BudgetExceeded) as context:
+            zerkel.interpret('mult', 40, 40, budget=Budget(seconds=0.05, every=64))
+        self.assertEqual('seconds', context.exception.resource)
+        self.assertGreater(context.exception.seconds, 0.05)
+        with self.assertRaises(BudgetExceeded) as context:
+            zerkel.interpret('mult', 40, 40, budget=Budget(sets=10, every=64))
+        self.assertEqual('sets', context.exception.resource)
+        self.assertGreater(context.exception.sets, 10)
+
+    def test_interpreter_budget(self):
+        interpreter = Interpreter(zerkel.parse('add'), budget=Budget(steps=10))
+        with self.assertRaises(BudgetExceeded):
+            interpreter.interpret(5, 5)
+        self.assertEqual(Set.generate_ordinal(10),
+                         Interpreter(zerkel.parse('add')).interpret(5, 5, budget=Budget(steps=10 ** 6)))
+        with self.assertRaises(BudgetExceeded):
+            zerkel.table('add', range(10), range(10), budget=Budget(steps=100))
+        with self.assertRaises(BudgetExceeded):
+            zerkel.benchmark('add', range(10), range(10), budget=Budget(steps=100))
+        with self.assertRaises(ValueError):
+            zerkel.interpret('add', 1, 1, engine='vm', budget=Budget(steps=100))
+
+
+class TestAttribution(unittest.TestCase):
+    def test_costs_add_up(self):
+        node = zerkel.parse('mult')
+        i = Interpreter(node)
+        attribution = CostAttribution()
+        counter = AtomicStepCounter()
+        i.add_observer(attribution)
+        i.add_observer(counter)
+        i.interpret(3, 4)
+        self.assertLess(0, counter.steps)
+        self.assertEqual(counter.steps, attribution.steps)
+        self.assertEqual(counter.steps, sum(c[0] for c in attribution.exclusive.values()))
+        self.assertEqual(counter.steps, attribution.inclusive[node][0])
+        for node, cost in attribution.inclusive.items():
+            self.assertGreaterEqual(cost[0], attribution.exclusive[node][0])
+            self.assertLessEqual(cost[0], counter.steps)
+
+    def test_collapsed(self):
+        attribution = zerkel.attribute('add', 3, 3)
+        lines = attribution.collapsed().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, value = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('add'))
+            self.assertGreater(int(value), 0)
+        self.assertEqual(attribution.steps, sum(int(line.rsplit(' ', 1)[1]) for line in lines))
+
+    def test_rows(self):
+        attribution = zerkel.attribute('mult', 2, 3)
+        rows = attribution.rows('exclusive steps')
+        self.assertEqual(sorted((row[1] for row in rows), reverse=True), [row[1] for row in rows])
+        self.assertEqual('mult', attribution.rows()[0][0])
+        self.assertIn('inclusive time', attribution.table(limit=5))
+
+
+class TestCompiler(unittest.TestCase):
+    def test_same_results(self):
+        assert_same_results(self, lambda node: CompiledProgram(node).interpret)
+
+    def test_engine(self):
+        self.assertEqual(Set.generate_ordinal(12), zerkel.interpret('mult', 3, 4, engine='compiled'))
+        self.assertEqual(Set.generate_ordinal(9), zerkel.interpret('power', 3, 2, engine='compiled'))
+        self.assertRaises(ValueError, zerkel.interpret, 'o+II', 1, engine='jit')
+
+    def test_deep_recursion(self):
+        # The recursion is a loop, not nested Python calls.
+        result = zerkel.interpret('add', 2000, 1, engine='compiled')
+        self.assertEqual(2001, result.ordinal)
+
+    def test_arena(self):
+        arena = SetArena()
+        compiled = zerkel.compile_program('mult', arena)
+        self.assertEqual(42, arena.ordinal(compiled.interpret(6, 7)))
+
+    def test_in_with_same_branches(self):
+        # The operands are not read, mult(40, 40) would take seconds.
+        mult = Composition(zerkel.parse('mult'), Identity(), Identity())
+        node = Composition(zerkel.parse('!>I>I'), Identity(), mult)
+        self.assertIs(Set.generate_ordinal(40), CompiledProgram(node).interpret(40))
+
+    def test_not_enough_arguments(self):
+        compiled = zerkel.compile_program('o+II')
+        self.assertRaises(MismatchedNumberOfArguments, compiled.interpret)
+
+
+class TestVirtualMachine(unittest.TestCase):
+    def test_same_results(self):
+        assert_same_results(self, lambda node: VirtualMachine.from_node(node).interpret)
+
+    def test_engine(self):
+        self.assertEqual(Set.generate_ordinal(12), zerkel.interpret('mult', 3, 4, engine='vm'))
+        self.assertEqual(2001, zerkel.interpret('add', 2000, 1, engine='vm').ordinal)
+
+    def test_serialization(self):
+        bytecode = Assembler().assemble(zerkel.parse('power'))
+        data = bytecode.to_bytes()
+        loaded = Bytecode.from_bytes(data)
+        self.assertEqual(data, loaded.to_bytes())
+        self.assertEqual(Set.generate_ordinal(8), VirtualMachine(loaded).interpret(2, 3))
+        self.assertRaises(CodecException, Bytecode.from_bytes, data[:-1])
+        self.assertRaises(CodecException, Bytecode.from_bytes, b'ZPRG' + data[4:])
+
+    def test_observers(self):
+        vm = VirtualMachine.from_node(zerkel.parse('add'))
+        steps, atomic = StepCounter(), AtomicInstructionCounter()
+        vm.add_observer(steps)
+        vm.add_observer(atomic)
+        vm.interpret(3, 2)
+        self.assertGreater(steps.steps, atomic.steps)
+        self.assertGreater(atomic.steps, 0)
+
+    def test_in_with_same_branches(self):
+        mult = Composition(zerkel.parse('mult'), Identity(), Identity())
+        vm = VirtualMachine.from_node(Composition(zerkel.parse('!>I>I'), Identity(), mult))
+        steps = StepCounter()
+        vm.add_observer(steps)
+        self.assertIs(Set.generate_ordinal(40), vm.interpret(40))
+        self.assertLess(steps.steps, 10)
+
+    def test_arena(self):
+        arena = SetArena()
+        vm = VirtualMachine.from_node(zerkel.parse('mult'), arena)
+        self.assertEqual(42, arena.ordinal(vm.interpret(6, 7)))
+
 
 class TestGeneration(unittest.TestCase):
     def test_generation_successor(self):
@@ -1,6 +1,17 @@
+from .cache import InternTable, InternStats, LRUCache, CacheStats
 from .set import Set, SetParsingException
 from .node import (
     Visitable, Node, NodeVisitor, EmptySet, Identity,
     UnionPlus, IfThenElse, In, Projection, Composition,
     Recursion, Union, Merge, Function
 )
+from .storage import dump_sets, load_sets, SetFile, SetFileException
+from .kernel import (
+    WellFounded, big_union, transitive_closure, closure, ordinal, rank_set
+)
+from .arena import SetArena, SetHandle
+from .batch import SetBatch, ranks, cardinals, ordinals, transitivity, tuples
+from .codec import (
+    encode, decode, dump_programs, load_programs, ProgramReader, ProgramWriter,
+    CodecException
+)
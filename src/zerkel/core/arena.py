@@ -0,0 +1,207 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from zerkel.core.set import Set
+
+
+class SetArena:
+    """
+    Struct-of-arrays storage of hereditarily finite sets.
+
+    A set is an integer id. The elements of the set i are the ids
+    ``elements[offsets[i]:offsets[i + 1]]``, sorted and distinct, and rank,
+    cardinal, ordinal (-1 when the set is not an ordinal) and hash are kept
+    in typed arrays. Sets are interned, two ids are equal if and only if the
+    sets are, and every element is created before the sets containing it,
+    so the ids are a topological order of the membership relation.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self._length = 0
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._elements = np.empty(capacity, dtype=np.uint32)
+        self._rank = np.empty(capacity, dtype=np.int32)
+        self._cardinal = np.empty(capacity, dtype=np.uint32)
+        self._ordinal = np.empty(capacity, dtype=np.int32)
+        self._hash = np.empty(capacity, dtype=np.int64)
+        self._index: Dict[int, int] = {}
+        self._ordinals: List[int] = []
+        self.empty_set = self.intern([])
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reserve(self, length: int) -> None:
+        if self.size == len(self._rank):
+            capacity = 2 * len(self._rank)
+            self._offsets = np.resize(self._offsets, capacity + 1)
+            for name in ('_rank', '_cardinal', '_ordinal', '_hash'):
+                setattr(self, name, np.resize(getattr(self, name), capacity))
+        if self._length + length > len(self._elements):
+            capacity = max(2 * len(self._elements), self._length + length)
+            self._elements = np.resize(self._elements, capacity)
+
+    def intern(self, elements: Iterable[int]) -> int:
+        """Id of the set of the given element ids, in any order."""
+        return self._intern(sorted(set(elements)))
+
+    def _intern(self, elements: List[int]) -> int:
+        # elements must be sorted and distinct, colliding hashes are probed
+        # linearly in the index.
+        h = hash(tuple(elements))
+        key = h
+        while True:
+            i = self._index.get(key)
+            if i is None:
+                break
+            if self._elements[self._offsets[i]:self._offsets[i + 1]].tolist() == elements:
+                return i
+            key += 1
+        n = len(elements)
+        self._reserve(n)
+        i = self.size
+        start = self._length
+        self._elements[start:start + n] = elements
+        self._length += n
+        self._offsets[i + 1] = self._length
+        if n > 16:
+            view = self._elements[start:start + n]
+            rank = int(self._rank[view].max()) + 1
+            ordinals = self._ordinal[view]
+            ordinal = n if ordinals.min() >= 0 and ordinals.max() == n - 1 else -1
+        else:
+            # Indexing scalars is cheaper than numpy calls on small sets.
+            ranks, ordinals = self._rank, self._ordinal
+            rank = max([ranks[e] for e in elements], default=-1) + 1
+            found = [ordinals[e] for e in elements]
+            ordinal = n if min(found, default=0) >= 0 and max(found, default=-1) == n - 1 else -1
+        self._rank[i] = rank
+        self._cardinal[i] = n
+        self._ordinal[i] = ordinal
+        self._hash[i] = h
+        self._index[key] = i
+        self.size += 1
+        return i
+
+    def elements(self, i: int) -> List[int]:
+        return self._elements[self._offsets[i]:self._offsets[i + 1]].tolist()
+
+    def rank(self, i: int) -> int:
+        return int(self._rank[i])
+
+    def cardinal(self, i: int) -> int:
+        return int(self._cardinal[i])
+
+    def ordinal(self, i: int) -> Optional[int]:
+        ordinal = int(self._ordinal[i])
+        return None if ordinal < 0 else ordinal
+
+    def hash(self, i: int) -> int:
+        return int(self._hash[i])
+
+    def empty(self) -> int:
+        return self.empty_set
+
+    def contains(self, x: int, y: int) -> bool:
+        """Whether y is an element of x."""
+        start, stop = self._offsets[x], self._offsets[x + 1]
+        j = start + np.searchsorted(self._elements[start:stop], y)
+        return bool(j < stop and self._elements[j] == y)
+
+    def adjoin(self, x: int, y: int) -> int:
+        """Id of x ∪ {y}."""
+        if self.contains(x, y):
+            return x
+        elements = self.elements(x)
+        elements.insert(int(np.searchsorted(elements, y)), y)
+        return self._intern(elements)
+
+    def union(self, *ids: int) -> int:
+        if not ids:
+            return self.empty_set
+        if len(ids) == 1:
+            return ids[0]
+        parts = [self._elements[self._offsets[i]:self._offsets[i + 1]] for i in ids]
+        return self._intern(np.unique(np.concatenate(parts)).tolist())
+
+    def generate_ordinal(self, n: int) -> int:
+        ordinals = self._ordinals
+        if not ordinals:
+            ordinals.append(self.empty_set)
+        while len(ordinals) <= n:
+            o = ordinals[-1]
+            ordinals.append(self.adjoin(o, o))
+        return ordinals[n]
+
+    def from_set(self, s: Set) -> int:
+        ids: Dict[Set, int] = {}
+        stack = [(s, False)]
+        while stack:
+            t, expanded = stack.pop()
+            if expanded:
+                ids[t] = self.intern(ids[e] for e in t)
+            elif t not in ids:
+                stack.append((t, True))
+                stack.extend((e, False) for e in t if e not in ids)
+        return ids[s]
+
+    def to_set(self, i: int) -> Set:
+        needed = {i}
+        stack = [i]
+        while stack:
+            for e in self.elements(stack.pop()):
+                if e not in needed:
+                    needed.add(e)
+                    stack.append(e)
+        # Elements have smaller ids than the sets containing them.
+        sets: Dict[int, Set] = {}
+        for j in sorted(needed):
+            sets[j] = Set._intern(frozenset(sets[e] for e in self.elements(j)))
+        return sets[i]
+
+    def handle(self, i: int) -> 'SetHandle':
+        return SetHandle(self, i)
+
+
+class SetHandle:
+    """Thin view of a set stored in a SetArena."""
+    __slots__ = ['arena', 'id']
+
+    def __init__(self, arena: SetArena, i: int):
+        self.arena = arena
+        self.id = i
+
+    @property
+    def rank(self) -> int:
+        return self.arena.rank(self.id)
+
+    @property
+    def ordinal(self) -> Optional[int]:
+        return self.arena.ordinal(self.id)
+
+    def __len__(self) -> int:
+        return self.arena.cardinal(self.id)
+
+    def __iter__(self):
+        return (SetHandle(self.arena, e) for e in self.arena.elements(self.id))
+
+    def __contains__(self, other: 'SetHandle') -> bool:
+        return (isinstance(other, SetHandle) and other.arena is self.arena
+                and self.arena.contains(self.id, other.id))
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, SetHandle) and other.arena is self.arena
+                and other.id == self.id)
+
+    def __hash__(self) -> int:
+        return self.arena.hash(self.id)
+
+    def to_set(self) -> Set:
+        return self.arena.to_set(self.id)
+
+    def __str__(self) -> str:
+        return str(self.to_set())
+
+    __repr__ = __str__
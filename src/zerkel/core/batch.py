@@ -0,0 +1,179 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from zerkel.core.arena import SetArena
+from zerkel.core.set import Set
+
+
+def _graph(sets: Sequence[Set]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Offsets and elements of every distinct sub-set, in discovery order,
+    # and the indices of the given sets. Interned sets are indexed by id.
+    index: Dict[int, int] = {}
+    nodes = []
+    for s in sets:
+        if id(s) not in index:
+            index[id(s)] = len(nodes)
+            nodes.append(s)
+    roots = np.fromiter((index[id(s)] for s in sets), np.int64, len(sets))
+    for s in nodes:
+        for e in s.elements:
+            if id(e) not in index:
+                index[id(e)] = len(nodes)
+                nodes.append(e)
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, nodes), np.int64, len(nodes)), out=offsets[1:])
+    elements = np.fromiter((index[id(e)] for s in nodes for e in s.elements),
+                           np.int64, int(offsets[-1]))
+    return offsets, elements, roots
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    # Concatenation of the ranges [starts[i], stops[i]).
+    lengths = stops - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return shifts + np.arange(total)
+
+
+class SetBatch:
+    """
+    Properties of many sets at once, given as Set objects or as ids of a
+    SetArena. The sub-sets are indexed once and every property is computed
+    with numpy on the whole batch instead of set by set.
+    """
+
+    def __init__(self, sets: Sequence, arena: Optional[SetArena] = None):
+        self.arena = arena
+        if arena is None:
+            self.offsets, self.elements, self.roots = _graph(sets)
+        else:
+            self.offsets = arena._offsets[:arena.size + 1]
+            self.elements = arena._elements[:arena._length].astype(np.int64)
+            self.roots = np.asarray(sets, dtype=np.int64)
+        self.cardinal = np.diff(self.offsets)
+        self._rank: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.roots)
+
+    def _children(self, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Elements of the given sets, and the position of their set in nodes.
+        children = self.elements[_ranges(self.offsets[nodes], self.offsets[nodes + 1])]
+        owners = np.repeat(np.arange(len(nodes)), self.cardinal[nodes])
+        return children, owners
+
+    def _levels(self) -> np.ndarray:
+        # Rank of every sub-set. Sets are released level by level, a set is
+        # in the next level once all of its elements have been seen.
+        if self._rank is not None:
+            return self._rank
+        n = len(self.cardinal)
+        parents = np.repeat(np.arange(n), self.cardinal)
+        order = np.argsort(self.elements, kind='stable')
+        parents = parents[order]
+        counts = np.bincount(self.elements, minlength=n)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        remaining = self.cardinal.copy()
+        rank = np.empty(n, dtype=np.int64)
+        level = 0
+        frontier = np.flatnonzero(remaining == 0)
+        while frontier.size:
+            rank[frontier] = level
+            released = parents[_ranges(starts[frontier], starts[frontier] + counts[frontier])]
+            released, times = np.unique(released, return_counts=True)
+            remaining[released] -= times
+            frontier = released[remaining[released] == 0]
+            level += 1
+        self._rank = rank
+        return rank
+
+    def _transitive(self, nodes: np.ndarray) -> np.ndarray:
+        # A set is transitive when the elements of its elements belong to it.
+        n = len(self.cardinal)
+        children, owners = self._children(nodes)
+        members = np.sort(nodes[owners] * n + children)
+        grandchildren, parents = self._children(children)
+        queries = nodes[owners[parents]] * n + grandchildren
+        result = np.ones(len(nodes), dtype=bool)
+        if not len(queries):
+            return result
+        positions = np.searchsorted(members, queries)
+        positions[positions == len(members)] = 0
+        missing = members[positions] != queries
+        result[owners[parents[missing]]] = False
+        return result
+
+    def ranks(self) -> np.ndarray:
+        if self.arena is not None:
+            return self.arena._rank[self.roots].astype(np.int64)
+        return self._levels()[self.roots]
+
+    def cardinals(self) -> np.ndarray:
+        return self.cardinal[self.roots]
+
+    def ordinals(self) -> np.ndarray:
+        """Ordinal of every set, -1 for the sets that are not ordinals."""
+        if self.arena is not None:
+            return self.arena._ordinal[self.roots].astype(np.int64)
+        # Level by level, a set of cardinal n is the ordinal n when its
+        # elements are ordinals, all distinct, the greatest being n - 1.
+        rank = self._levels()
+        order = np.argsort(rank, kind='stable')
+        bounds = np.searchsorted(rank[order], np.arange(rank.max(initial=0) + 2))
+        ordinal = np.where(self.cardinal == 0, 0, -1)
+        for level in range(1, len(bounds) - 1):
+            nodes = order[bounds[level]:bounds[level + 1]]
+            children, _ = self._children(nodes)
+            values = ordinal[children]
+            starts = np.concatenate(([0], np.cumsum(self.cardinal[nodes])[:-1]))
+            low = np.minimum.reduceat(values, starts)
+            high = np.maximum.reduceat(values, starts)
+            cardinal = self.cardinal[nodes]
+            ordinal[nodes] = np.where((low >= 0) & (high == cardinal - 1), cardinal, -1)
+        return ordinal[self.roots]
+
+    def transitivity(self) -> np.ndarray:
+        return self._transitive(self.roots)
+
+    def tuples(self) -> np.ndarray:
+        """Whether every set is a pair {{x}, {x, y}} or a singleton {{x}}."""
+        offsets, elements, cardinal = self.offsets, self.elements, self.cardinal
+        cardinals = self.cardinals()
+        if not len(elements):
+            return np.zeros(len(self.roots), dtype=bool)
+        first = elements[np.minimum(offsets[self.roots], len(elements) - 1)]
+        last = elements[np.maximum(offsets[self.roots + 1] - 1, 0)]
+        singleton = (cardinals == 1) & (cardinal[first] == 1)
+        pair = cardinals == 2
+        # The element of the singleton must belong to the other element.
+        small = np.where(cardinal[first] == 1, first, last)
+        large = np.where(cardinal[first] == 1, last, first)
+        pair &= (cardinal[small] == 1) & (cardinal[large] == 2)
+        x = elements[np.minimum(offsets[small], len(elements) - 1)]
+        y = elements[np.minimum(offsets[large], len(elements) - 1)]
+        z = elements[np.minimum(offsets[large] + 1, len(elements) - 1)]
+        pair &= (x == y) | (x == z)
+        return singleton | pair
+
+
+def ranks(sets: Sequence, arena: Optional[SetArena] = None) -> np.ndarray:
+    return SetBatch(sets, arena).ranks()
+
+
+def cardinals(sets: Sequence, arena: Optional[SetArena] = None) -> np.ndarray:
+    return SetBatch(sets, arena).cardinals()
+
+
+def ordinals(sets: Sequence, arena: Optional[SetArena] = None) -> np.ndarray:
+    return SetBatch(sets, arena).ordinals()
+
+
+def transitivity(sets: Sequence, arena: Optional[SetArena] = None) -> np.ndarray:
+    return SetBatch(sets, arena).transitivity()
+
+
+def tuples(sets: Sequence, arena: Optional[SetArena] = None) -> np.ndarray:
+    return SetBatch(sets, arena).tuples()
@@ -0,0 +1,209 @@
+import gc
+import sys
+import threading
+import weakref
+from collections import OrderedDict, deque, namedtuple
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+InternStats = namedtuple(
+    'InternStats', ['hits', 'misses', 'live', 'retained', 'evictions', 'bytes']
+)
+
+
+class _Ref(weakref.ref):
+    __slots__ = ['key']
+
+
+class InternTable:
+    """
+    Interning table holding weak references to its values.
+
+    A value stays interned for as long as something references it, so
+    identity based equality holds for every live value. On top of that the
+    table keeps strong references to the ``maxsize`` most recently interned
+    values so that short lived values are not rebuilt over and over. When
+    that retention buffer is full the oldest value is evicted from it and
+    only survives if it is referenced elsewhere. ``maxsize=None`` retains
+    every value, which is the behaviour of a plain dict.
+
+    Lookups take no lock. When ``get`` misses, ``intern`` looks the key up
+    again and creates the value while holding the lock of the key, so that
+    two threads never intern two different values for the same key. Keys
+    are spread over ``stripes`` locks so that unrelated keys do not contend.
+
+    The weak reference callbacks run wherever the collector happens to run,
+    possibly while a lock is held, so they only queue the dead entries.
+    These are removed by the next ``intern``, ``add``, ``release`` or
+    ``stats``.
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, stripes: int = 64):
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, _Ref] = {}
+        self._retained: deque = deque(maxlen=maxsize)
+        self._locks = [threading.RLock() for _ in range(stripes)]
+        self._dead: deque = deque()
+        self._callback = self._dead.append
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        ref = self._data.get(key)
+        if ref is not None:
+            value = ref()
+            if value is not None:
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def lock(self, key: Hashable) -> threading.RLock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    def peek(self, key: Hashable) -> Any:
+        ref = self._data.get(key)
+        return None if ref is None else ref()
+
+    def intern(self, key: Hashable, factory: Callable[[Hashable], Any]) -> Any:
+        if self._dead:
+            self._purge()
+        with self._locks[hash(key) % len(self._locks)]:
+            ref = self._data.get(key)
+            value = None if ref is None else ref()
+            if value is not None:
+                return value
+            value = factory(key)
+            ref = _Ref(value, self._callback)
+            ref.key = key
+            self._data[key] = ref
+        # Outside of the lock, evicting a value may run a callback.
+        if self.maxsize != 0:
+            if len(self._retained) == self.maxsize:
+                self.evictions += 1
+            self._retained.append(value)
+        return value
+
+    def add(self, key: Hashable, value: Any) -> Any:
+        if self._dead:
+            self._purge()
+        ref = _Ref(value, self._callback)
+        ref.key = key
+        self._data[key] = ref
+        if self.maxsize != 0:
+            if len(self._retained) == self.maxsize:
+                self.evictions += 1
+            self._retained.append(value)
+        return value
+
+    def _purge(self) -> None:
+        dead = self._dead
+        while dead:
+            try:
+                ref = dead.popleft()
+            except IndexError:
+                return
+            lock = self.lock(ref.key)
+            # The lock of another key may already be held by this thread,
+            # waiting for this one could deadlock with a thread doing the
+            # converse. The entry is then left for a later purge.
+            if not lock.acquire(blocking=False):
+                dead.append(ref)
+                return
+            try:
+                # The key may have been interned again since, only its own
+                # entry is removed.
+                if self._data.get(ref.key) is ref:
+                    del self._data[ref.key]
+            finally:
+                lock.release()
+
+    def release(self) -> None:
+        self._retained.clear()
+        # Dead entries keep their keys, and what these reference, alive.
+        self._purge()
+
+    def clear(self) -> None:
+        self._retained.clear()
+        self._data.clear()
+        self._dead.clear()
+
+    def _snapshot(self) -> Dict[Hashable, _Ref]:
+        # A collection while copying may run finalizers interning values.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._data.copy()
+        finally:
+            if enabled:
+                gc.enable()
+
+    def values(self):
+        for ref in self._snapshot().values():
+            value = ref()
+            if value is not None:
+                yield value
+
+    def __contains__(self, key: Hashable) -> bool:
+        ref = self._data.get(key)
+        return ref is not None and ref() is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> InternStats:
+        self._purge()
+        size = 0
+        for key, ref in self._snapshot().items():
+            size += sys.getsizeof(key) + sys.getsizeof(ref)
+            value = ref()
+            if value is not None:
+                size += sys.getsizeof(value)
+        return InternStats(self.hits, self.misses, len(self._data),
+                           len(self._retained), self.evictions, size)
+
+
+CacheStats = namedtuple(
+    'CacheStats', ['hits', 'misses', 'size', 'maxsize', 'evictions']
+)
+
+
+class LRUCache:
+    def __init__(self, maxsize: Optional[int] = None):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, len(self._data),
+                          self.maxsize, self.evictions)
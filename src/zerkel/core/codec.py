@@ -0,0 +1,270 @@
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
+
+from zerkel.core.node import (
+    Node, NodeVisitor, EmptySet, Identity, UnionPlus, IfThenElse, In,
+    Projection, Composition, Recursion, Union, Merge, Function
+)
+
+
+# Programs are written in prefix order, one opcode byte per node followed
+# by its varint operands and then its children:
+#   E I + ? M          no operand
+#   ! R U              no operand, then 2, 1 and 1 children
+#   < >                left and right counts, then the projected program
+#   o                  number of compounds, then f and the compounds
+#   REF                index of a program already written
+# Every compound node gets the next index once all of its children are
+# written, a later occurrence is written as a REF. A stream starts with the
+# magic and version, then every program is prefixed by its length in bytes.
+# The indices are shared by all the programs of a stream.
+MAGIC = b'ZPRG'
+VERSION = 1
+
+EMPTY_SET, IDENTITY, UNION_PLUS, IF_THEN_ELSE, MERGE = range(5)
+IN, RECURSION, UNION, PROJECTION, COMPOSITION, REF = range(5, 11)
+
+
+class CodecException(Exception):
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __str__(self):
+        return f'Invalid program encoding: {self.reason}'
+
+
+def _varint(n: int, out: bytearray) -> None:
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data: bytes, i: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        try:
+            byte = data[i]
+        except IndexError:
+            raise CodecException('truncated varint')
+        i += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, i
+        shift += 7
+
+
+class Encoder(NodeVisitor):
+    def __init__(self):
+        self.index: Dict[Node, int] = {}
+        self._out = bytearray()
+        self._stack: List = []
+
+    def encode(self, node: Node) -> bytes:
+        out = self._out = bytearray()
+        stack = self._stack = [node]
+        index = self.index
+        added: List[Node] = []
+        try:
+            while stack:
+                item = stack.pop()
+                if isinstance(item, tuple):
+                    # All the children of item[0] have been written.
+                    index[item[0]] = len(index)
+                    added.append(item[0])
+                elif item in index:
+                    out.append(REF)
+                    _varint(index[item], out)
+                else:
+                    item.accept(self)
+        except CodecException:
+            # Nothing was written, the next programs must not refer to it.
+            for n in added:
+                del index[n]
+            raise
+        return bytes(out)
+
+    def _compound(self, opcode: int, node: Node, *children: Node) -> None:
+        self._out.append(opcode)
+        self._stack.append((node,))
+        self._stack.extend(reversed(children))
+
+    def visit_function(self, function: Function):
+        raise CodecException(f'intrinsic {function} can not be encoded')
+
+    def visit_empty_set(self, empty_set: EmptySet):
+        self._out.append(EMPTY_SET)
+
+    def visit_identity(self, identity: Identity):
+        self._out.append(IDENTITY)
+
+    def visit_union_plus(self, union_plus: UnionPlus):
+        self._out.append(UNION_PLUS)
+
+    def visit_if_then_else(self, if_then_else: IfThenElse):
+        self._out.append(IF_THEN_ELSE)
+
+    def visit_merge(self, merge: Merge):
+        self._out.append(MERGE)
+
+    def visit_in(self, in_operator: In):
+        self._compound(IN, in_operator, in_operator.f, in_operator.g)
+
+    def visit_recursion(self, recursion: Recursion):
+        self._compound(RECURSION, recursion, recursion.g)
+
+    def visit_union(self, union: Union):
+        self._compound(UNION, union, union.h)
+
+    def visit_projection(self, projection: Projection):
+        self._out.append(PROJECTION)
+        _varint(projection.left, self._out)
+        _varint(projection.right, self._out)
+        self._stack.append((projection,))
+        self._stack.append(projection.f)
+
+    def visit_composition(self, composition: Composition):
+        self._out.append(COMPOSITION)
+        _varint(len(composition.g), self._out)
+        self._stack.append((composition,))
+        self._stack.extend(reversed(composition.g))
+        self._stack.append(composition.f)
+
+
+_LEAVES = {
+    EMPTY_SET: EmptySet, IDENTITY: Identity, UNION_PLUS: UnionPlus,
+    IF_THEN_ELSE: IfThenElse, MERGE: Merge
+}
+
+
+class Decoder:
+    def __init__(self):
+        self.nodes: List[Node] = []
+
+    def decode(self, data: bytes) -> Node:
+        nodes = self.nodes
+        # Frames of the compound nodes being read: opcode, number of
+        # children still expected, children read so far and operands.
+        frames: List[list] = []
+        i = 0
+        while True:
+            if i >= len(data):
+                raise CodecException('truncated program')
+            opcode = data[i]
+            i += 1
+            if opcode in _LEAVES:
+                node = _LEAVES[opcode]()
+            elif opcode == REF:
+                n, i = _read_varint(data, i)
+                if n >= len(nodes):
+                    raise CodecException(f'unknown reference {n}')
+                node = nodes[n]
+            elif opcode == PROJECTION:
+                left, i = _read_varint(data, i)
+                right, i = _read_varint(data, i)
+                frames.append([opcode, 1, [], left, right])
+                continue
+            elif opcode == COMPOSITION:
+                n, i = _read_varint(data, i)
+                if n == 0:
+                    raise CodecException('composition without compounds')
+                frames.append([opcode, n + 1, []])
+                continue
+            elif opcode in (IN, RECURSION, UNION):
+                frames.append([opcode, 2 if opcode == IN else 1, []])
+                continue
+            else:
+                raise CodecException(f'unknown opcode {opcode}')
+            while frames:
+                frame = frames[-1]
+                frame[2].append(node)
+                frame[1] -= 1
+                if frame[1]:
+                    break
+                frames.pop()
+                node = self._build(frame)
+                nodes.append(node)
+            if not frames:
+                if i != len(data):
+                    raise CodecException('trailing bytes')
+                return node
+
+    @staticmethod
+    def _build(frame: list) -> Node:
+        opcode, _, children, *operands = frame
+        if opcode == IN:
+            return In(*children)
+        if opcode == RECURSION:
+            return Recursion(*children)
+        if opcode == UNION:
+            return Union(*children)
+        if opcode == PROJECTION:
+            return Projection(children[0], *operands)
+        return Composition(*children)
+
+
+def encode(node: Node) -> bytes:
+    return Encoder().encode(node)
+
+
+def decode(data: bytes) -> Node:
+    return Decoder().decode(data)
+
+
+class ProgramWriter:
+    """Writes programs one after the other to a binary file."""
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.encoder = Encoder()
+        file.write(MAGIC + bytes([VERSION]))
+
+    def write(self, node: Node) -> None:
+        data = self.encoder.encode(node)
+        length = bytearray()
+        _varint(len(data), length)
+        self.file.write(bytes(length) + data)
+
+
+class ProgramReader:
+    """Reads back, lazily, the programs written by a ProgramWriter."""
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.decoder = Decoder()
+        if file.read(len(MAGIC) + 1) != MAGIC + bytes([VERSION]):
+            raise CodecException('unknown format')
+
+    def _length(self) -> int:
+        n = shift = 0
+        while True:
+            byte = self.file.read(1)
+            if not byte:
+                if shift:
+                    raise CodecException('truncated length')
+                return -1
+            n |= (byte[0] & 0x7f) << shift
+            if byte[0] < 0x80:
+                return n
+            shift += 7
+
+    def __iter__(self) -> Iterator[Node]:
+        while True:
+            length = self._length()
+            if length < 0:
+                return
+            data = self.file.read(length)
+            if len(data) != length:
+                raise CodecException('truncated program')
+            yield self.decoder.decode(data)
+
+
+def dump_programs(programs: Iterable[Node], path: str) -> None:
+    with open(path, 'wb') as f:
+        writer = ProgramWriter(f)
+        for node in programs:
+            writer.write(node)
+
+
+def load_programs(path: str) -> List[Node]:
+    with open(path, 'rb') as f:
+        return list(ProgramReader(f))
@@ -0,0 +1,66 @@
+from typing import Callable, Dict, List
+
+from zerkel.core.cache import LRUCache
+from zerkel.core.set import Set
+
+
+class WellFounded:
+    """
+    Well-founded recursion on the membership relation.
+
+    ``WellFounded(step)`` is the function F such that
+    ``F(x, *p) = step(U, x, *p)`` where U is the union of the ``F(u, *p)``
+    for every element u of x, which is what the ``R`` token computes. The
+    sub-sets of x are visited bottom-up with an explicit stack and every
+    result is memoized, in a bounded cache, per interned set, so shared
+    sub-sets are only computed once.
+    """
+
+    def __init__(self, step: Callable[..., Set], maxsize: int = 1 << 16):
+        self.step = step
+        self.cache = LRUCache(maxsize)
+
+    def __call__(self, x: Set, *parameters: Set) -> Set:
+        cache = self.cache
+        results: Dict[Set, Set] = {}
+        order: List[Set] = []
+        stack = [(x, False)]
+        while stack:
+            s, expanded = stack.pop()
+            if expanded:
+                order.append(s)
+            elif s not in results:
+                value = cache.get((s, *parameters))
+                results[s] = value
+                if value is None:
+                    stack.append((s, True))
+                    stack.extend((u, False) for u in s if u not in results)
+        for s in order:
+            union = Set.union(*(results[u] for u in s))
+            results[s] = cache.put((s, *parameters), self.step(union, s, *parameters))
+        return results[x]
+
+
+def big_union(x: Set) -> Set:
+    return Set.union(*x)
+
+
+# x together with the elements of its elements, recursively.
+transitive_closure = WellFounded(lambda a, x: Set.union(a, x))
+
+# The transitive closure of {x}, computed by the R+ program.
+closure = WellFounded(lambda a, x: a.adjoin(x))
+
+
+_ordinals: List[Set] = [Set()]
+
+
+def ordinal(n: int) -> Set:
+    while len(_ordinals) <= n:
+        o = _ordinals[-1]
+        _ordinals.append(o.adjoin(o))
+    return _ordinals[n]
+
+
+def rank_set(x: Set) -> Set:
+    return ordinal(x.rank)
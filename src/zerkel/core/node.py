@@ -1,16 +1,23 @@
+import hashlib
+import itertools
 from functools import wraps
 from collections import defaultdict
+from typing import (
+    Callable, List, Optional, TextIO, Tuple, Union as Union_
+)
+
+from zerkel.core.cache import InternTable, InternStats
 
 
 class _cache(type):
     def __call__(cls, *args, **kwargs):
         key = (cls, *args, *kwargs.items())
-        try:
-            return cls.cache[key]
-        except KeyError:
-            instance = type.__call__(cls, *args, **kwargs)
-            cls.cache[key] = instance
-            return instance
+        instance = cls.cache.get(key)
+        if instance is None:
+            instance = cls.cache.intern(
+                key, lambda key: type.__call__(cls, *args, **kwargs)
+            )
+        return instance
 
 
 cache = _cache('NodeCache', (), {})
@@ -22,23 +29,64 @@ class Visitable:
 
 
 class Node(Visitable, cache):
-    cache = {}
-    
+    """
+    Nodes are hash-consed: building a node equal to a live one returns it,
+    so equality is identity. Every node gets a dense integer id in creation
+    order. The node table only holds weak references, plus strong ones to
+    the most recently built nodes, and forgets the nodes nothing uses.
+    """
+    cache = InternTable(maxsize=1 << 12)
+    _ids = itertools.count()
+
     def __init__(self, arity: int, *children: 'Node'):
+        self.id = next(Node._ids)
         self.arity = arity
         self.size: int = 1 + sum(child.size for child in children)
         self.children = children
-        self._hash = hash((self.__class__, self.children))
+        self._digest: Optional[bytes] = None
+        # Text of the node written by a Printer, see Printer.
+        self._text: Optional[Tuple['Printer', str]] = None
 
-    def __eq__(self, other):
-        if self is other:
-            return True
-        if not isinstance(other, self.__class__):
-            return False
-        return self.children == other.children
+    @classmethod
+    def clear_cache(cls):
+        cls.cache.release()
+
+    @classmethod
+    def cache_stats(cls) -> InternStats:
+        return cls.cache.stats()
 
     def __hash__(self):
-        return self._hash
+        return self.id
+
+    @property
+    def digest(self) -> bytes:
+        """
+        128-bit structural digest, the same in every process, unlike the
+        id and the hash.
+        """
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            if node._digest is not None:
+                stack.pop()
+                continue
+            pending = [c for c in node._digest_children() if c._digest is None]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            h = hashlib.blake2b(node._digest_label(), digest_size=16,
+                                person=b'zerkel-node')
+            for child in node._digest_children():
+                h.update(child._digest)
+            node._digest = h.digest()
+        return self._digest
+
+    def _digest_label(self) -> bytes:
+        return self.__class__.__name__.encode() + b'\0'
+
+    def _digest_children(self) -> Tuple['Node', ...]:
+        return self.children
 
     def __str__(self):
         return ascii_printer.print(self)
@@ -47,13 +95,18 @@ class Node(Visitable, cache):
 
 
 class Function(Node):
+    """
+    Intrinsic: node whose evaluation is done by a Python callback instead
+    of its definition. Building one does not change how programs are
+    parsed, pass the intrinsics to the Interpreter to use them.
+    """
+
     def __init__(self, node: Node, callback):
         super().__init__(node.arity, *node.children)
         if isinstance(node, Function):
             node = node.node
         self.node = node
         self.callback = callback
-        self.cache[(node.__class__, *node.children)] = self
     
     def accept(self, visitor: 'NodeVisitor'):
         visitor.visit_function(self)
@@ -61,11 +114,12 @@ class Function(Node):
     def call(self, stack, expression, parameters):
         self.callback(stack, expression, parameters)
 
-    def __hash__(self):
-        return hash(self.node)
+    def _digest_label(self) -> bytes:
+        name = getattr(self.callback, '__qualname__', type(self.callback).__name__)
+        return f'Function\0{name}\0'.encode()
 
-    def __eq__(self, other):
-        return self is other or self.node == self.other
+    def _digest_children(self) -> Tuple[Node, ...]:
+        return (self.node,)
 
     def __str__(self):
         return f'({ascii_printer.print(self.node)})'
@@ -125,14 +179,9 @@ class Projection(Node):
 
     def accept(self, visitor: 'NodeVisitor'):
         visitor.visit_projection(self)
-    
-    def __eq__(self, other):
-        if not super().__eq__(other):
-            return False
-        return self.left == other.left and self.right == other.right
 
-    def __hash__(self):
-        return hash((super().__hash__(), self.left, self.right))
+    def _digest_label(self) -> bytes:
+        return f'Projection\0{self.left}\0{self.right}\0'.encode()
 
 
 class Composition(Node):
@@ -206,7 +255,18 @@ class NodeVisitor:
         pass
 
 
-class Printer(NodeVisitor):
+class Printer:
+    """
+    Serializes programs with an explicit stack into a list of parts. Every
+    compound node whose text is at most ``cache_limit`` characters keeps it,
+    reused when the node appears inside a program printed later, which is
+    how generated programs are built. Larger nodes are written again from
+    the text of their children, so that a node never holds more than its
+    own short text. A node keeps the text of the last Printer that printed
+    it.
+    """
+    cache_limit = 256
+
     def __init__(self, empty_set, identity, union_plus, if_then_else, 
                  in_operator, left, right, composition, recursion,
                  union, merge):
@@ -221,54 +281,125 @@ class Printer(NodeVisitor):
         self.recursion = recursion
         self.union = union
         self.merge = merge
-        self.result = None
 
     def print(self, node: Node) -> str:
-        self.result = ''
-        node.accept(self)
-        return self.result
+        entry = node._text
+        if entry is not None and entry[0] is self:
+            return entry[1]
+        return _Serialization(self).run(node)
+
+    def dump(self, node: Node, file: TextIO, buffer: int = 1 << 12) -> None:
+        self.write(node, file.write, buffer)
+
+    def write(self, node: Node, write: Callable[[str], None], chunk: int = 1 << 12) -> None:
+        """Gives the text to write in chunks of about chunk parts."""
+        _Serialization(self, write, chunk).run(node)
+
+
+_END = object()
+
+
+class _Serialization(NodeVisitor):
+    """
+    A single serialization by a Printer, its state is not shared so that
+    printing is reentrant.
+    """
+
+    def __init__(self, printer: Printer,
+                 write: Optional[Callable[[str], None]] = None,
+                 chunk: int = 1 << 12):
+        self.printer = printer
+        self.write = write
+        self.chunk = chunk
+        self.parts: List[str] = []
+        self.stack: List[Union_[str, Node, object]] = []
+
+    def run(self, node: Node) -> str:
+        printer = self.printer
+        limit = printer.cache_limit
+        parts, write, chunk = self.parts, self.write, self.chunk
+        stack = self.stack = [node]
+        # Indices of the first part of the nodes small enough to be cached
+        # that are being written, counted from the first part written. The
+        # parts before base were flushed and dropped, those before flushed
+        # were flushed only as they are still needed by pending nodes.
+        pending: List[int] = []
+        base = flushed = 0
+        flush = chunk if write is not None else float('inf')
+        pop, append = stack.pop, parts.append
+        while stack:
+            item = pop()
+            if item.__class__ is str:
+                append(item)
+            elif item is _END:
+                item = pop()
+                text = ''.join(parts[pending.pop() - base:])
+                if len(text) <= limit:
+                    item._text = (printer, text)
+            elif not item.children:
+                item.accept(self)
+            else:
+                entry = item._text
+                if entry is not None and entry[0] is printer:
+                    append(entry[1])
+                elif item.size <= limit:
+                    pending.append(base + len(parts))
+                    stack += item, _END
+                    item.accept(self)
+                else:
+                    item.accept(self)
+            if base + len(parts) >= flush:
+                write(''.join(parts[flushed - base:]))
+                flushed = base + len(parts)
+                flush = flushed + chunk
+                keep = pending[0] if pending else flushed
+                del parts[:keep - base]
+                base = keep
+        if write is not None:
+            write(''.join(parts[flushed - base:]))
+            return ''
+        return ''.join(parts)
 
     def visit_function(self, function: Function):
-        self.result += str(function)
+        self.parts.append('(')
+        self.stack += [')', function.node]
 
     def visit_empty_set(self, empty_set: EmptySet):
-        self.result += self.empty_set
+        self.parts.append(self.printer.empty_set)
 
     def visit_identity(self, identity: Identity):
-        self.result += self.identity
+        self.parts.append(self.printer.identity)
 
     def visit_union_plus(self, union_plus: UnionPlus):
-        self.result += self.union_plus
+        self.parts.append(self.printer.union_plus)
 
     def visit_if_then_else(self, if_then_else: IfThenElse):
-        self.result += self.if_then_else
+        self.parts.append(self.printer.if_then_else)
     
     def visit_in(self, in_operator: In):
-        self.result += self.in_operator
-        in_operator.f.accept(self)
-        in_operator.g.accept(self)
+        self.parts.append(self.printer.in_operator)
+        self.stack += [in_operator.g, in_operator.f]
 
     def visit_projection(self, projection: Projection):
-        self.result += self.left * projection.left
-        self.result += self.right * projection.right
-        projection.f.accept(self)
+        p = self.printer
+        self.parts.append(p.left * projection.left + p.right * projection.right)
+        self.stack.append(projection.f)
 
     def visit_composition(self, composition: Composition):
-        self.result += self.composition
-        composition.f.accept(self)
-        for g in composition.g:
-            g.accept(self)
+        self.parts.append(self.printer.composition)
+        self.stack.extend(reversed(composition.g))
+        self.stack.append(composition.f)
 
     def visit_recursion(self, recursion: Recursion):
-        self.result += self.recursion
-        recursion.g.accept(self)
+        self.parts.append(self.printer.recursion)
+        self.stack.append(recursion.g)
 
     def visit_union(self, union: Union):
-        self.result += self.union
-        union.h.accept(self)
+        self.parts.append(self.printer.union)
+        self.stack.append(union.h)
 
     def visit_merge(self, merge: Merge):
-        self.result += self.merge
+        self.parts.append(self.printer.merge)
 
 
 ascii_printer = Printer('E', 'I', '+', '?', '!', '<', '>', 'o', 'R', 'U', 'M')
@@ -1,10 +1,10 @@
-from typing import Set as _Set, Dict, Tuple
+from typing import (
+    Set as _Set, Dict, List, Tuple, Optional as _Optional
+)
+import hashlib
 import random
 
-from pyparsing import (
-    Literal, Word, ZeroOrMore, Forward,
-    nums, oneOf, Group, ParseException, Optional
-)
+from zerkel.core.cache import InternTable, InternStats
 
 
 
@@ -13,29 +13,93 @@ def boxify(lines, rows=None, columns=None):
     return ["╔" + "═" * (size + 2) + "╗"] + ["║ " + l + " " * (size - len(l)) + " ║" for l in lines] + ["╚" + "═" * (size + 2) + "╝"]
 
 
-def _syntax():
-    op = Literal(',').suppress()
-    left_bracket = Literal('{').suppress()
-    right_bracket = Literal('}').suppress()
-    ordinal = Word(nums)
-    ordinal.addParseAction(lambda tokens: Set.generate_ordinal(int(tokens[0])))
-    non_ordinal = Word(nums)
-    non_ordinal.setParseAction(lambda tokens: Set.generate(int(tokens[0])))
-    lt = Literal('<').suppress()
-    gt = Literal('>').suppress()
-    non_ordinal = lt + non_ordinal + gt
-    element = ordinal ^ non_ordinal
-    expr = Forward()
-    group = Group(left_bracket + Optional(expr) + right_bracket)
-    group.addParseAction(lambda tokens: Set(*tokens[0]))
-    left_parenthesis = Literal('(').suppress()
-    right_parenthesis = Literal(')').suppress()
-    atom = Forward()
-    tuple = Group(left_parenthesis + atom + op + expr + right_parenthesis)
-    tuple.addParseAction(lambda tokens: Set.generate_tuple(*tokens[0]))
-    atom << (element | group | tuple)
-    expr << (atom + ZeroOrMore(op + atom))
-    return expr
+_WHITESPACES = ' \t\r\n'
+_DIGITS = '0123456789'
+
+
+def _parse_literals(text: str, many: bool) -> List['Set']:
+    """
+    Single pass parser of set literals, ordinals, <n> codes and tuples.
+
+    Open braces and parentheses are kept on an explicit stack and every
+    set is interned as soon as it is closed. When many is set, literals are
+    separated by commas or whitespaces, otherwise the first literal is
+    returned as soon as it is complete and the rest of the text is ignored.
+    Errors are reported at the first unexpected character.
+    """
+    frames: List[Tuple[str, List[Set]]] = []
+    results: List[Set] = []
+    n = len(text)
+    i = 0
+    expect_atom = True
+    after_comma = False
+    while True:
+        while i < n and text[i] in _WHITESPACES:
+            i += 1
+        if i == n:
+            if frames or expect_atom and (after_comma or not many):
+                raise SetParsingException(text, i + 1)
+            return results
+        c = text[i]
+        if expect_atom:
+            value = None
+            if c in _DIGITS:
+                j = i
+                while j < n and text[j] in _DIGITS:
+                    j += 1
+                value = Set.generate_ordinal(int(text[i:j]))
+                i = j
+            elif c == '<':
+                i += 1
+                while i < n and text[i] in _WHITESPACES:
+                    i += 1
+                j = i
+                while j < n and text[j] in _DIGITS:
+                    j += 1
+                if j == i:
+                    raise SetParsingException(text, i + 1)
+                code = int(text[i:j])
+                i = j
+                while i < n and text[i] in _WHITESPACES:
+                    i += 1
+                if i == n or text[i] != '>':
+                    raise SetParsingException(text, i + 1)
+                value = Set.generate(code)
+                i += 1
+            elif c in '{(':
+                frames.append((c, []))
+                after_comma = False
+                i += 1
+                continue
+            elif c == '}' and frames and frames[-1][0] == '{' and not after_comma:
+                frames.pop()
+                value = Set()
+                i += 1
+            else:
+                raise SetParsingException(text, i + 1)
+        elif c == ',':
+            expect_atom = after_comma = True
+            i += 1
+            continue
+        elif c == '}' and frames and frames[-1][0] == '{':
+            value = Set._intern(frozenset(frames.pop()[1]))
+            i += 1
+        elif c == ')' and frames and frames[-1][0] == '(' and len(frames[-1][1]) > 1:
+            value = Set.generate_tuple(*frames.pop()[1])
+            i += 1
+        elif many and not frames:
+            expect_atom = True
+            after_comma = False
+            continue
+        else:
+            raise SetParsingException(text, i + 1)
+        if frames:
+            frames[-1][1].append(value)
+        elif many:
+            results.append(value)
+        else:
+            return [value]
+        expect_atom = after_comma = False
 
 
 class SetParsingException(Exception):
@@ -50,29 +114,243 @@ class SetParsingException(Exception):
 NOT_COMPUTED_YET = 'NOT COMPUTED YET'
 
 
+def _compute_rank(s: 'Set') -> int:
+    return max((e._rank for e in s.elements), default=-1) + 1
+
+
+def _compute_size(s: 'Set') -> int:
+    return 1 + sum(e._size for e in s.elements)
+
+
+def _compute_ordinal(s: 'Set') -> _Optional[int]:
+    n = len(s.elements)
+    ords = set(range(n))
+    for e in s.elements:
+        ords.discard(e._ordinal)
+    return n if not ords else None
+
+
+def _tree_label(s: 'Set') -> str:
+    return '.' if s.ordinal is None else str(s.ordinal)
+
+
+def _tree_block(this: str, children: List[Tuple[List[str], int]]):
+    if not children:
+        return [this], len(this)
+    if len(children) == 1:
+        (body, width), = children
+        size = max(len(this), width)
+        return [this.center(size), '║'.center(size),
+                *[line.center(size) for line in body]], size
+    size = max(len(this), sum(w for _, w in children) + len(children) - 1)
+    middle = size // 2
+    height = max(len(b) for b, _ in children)
+    rows: List[List[str]] = [[] for _ in range(height)]
+    roots = []
+    length = -1
+    for body, width in children:
+        length += 1
+        roots.append(length + width // 2)
+        length += width
+        for i in range(height):
+            rows[i].append(body[i] if i < len(body) else ' ' * width)
+    links = ' ' * roots[0] + '╔'
+    for i, r in enumerate(roots[1:], 2):
+        if len(links) <= middle and r > middle:
+            links += '═' * (middle - len(links)) + '╩' + '═' * (r - middle - 1)
+        else:
+            links += '═' * (r - len(links))
+        if r == middle:
+            links += '╬'
+        elif i < len(roots):
+            links += '╦'
+        else:
+            links += '╗'
+    links += ' ' * (size - len(links))
+    return [this.center(size), links,
+            *[' '.join(row).center(size) for row in rows]], size
+
+
+def _tuple_items(t: tuple, depth: int) -> List:
+    items: List = ['(']
+    for x in t:
+        if isinstance(x, tuple):
+            items += _tuple_items(x, depth + 1)
+        else:
+            items.append((x, depth, False))
+        items.append(', ')
+    items[-1] = ')'
+    return items
+
+
+def _write(items: List, max_depth: _Optional[int], max_chars: _Optional[int],
+           max_elements: _Optional[int], share: bool) -> str:
+    """
+    Iterative writer of set literals. Items are strings written as is or
+    (set, depth, force) triples, force writes braces even for ordinals.
+    """
+    children: Dict['Set', List['Set']] = {}
+
+    def expand(s: 'Set', depth: int, force: bool) -> bool:
+        if not force and s.ordinal is not None:
+            return False
+        if max_depth is not None and depth >= max_depth:
+            return False
+        if s not in children:
+            children[s] = sorted(s.elements, key=_sort_key)
+        return True
+
+    labels: Dict['Set', int] = {}
+    if share:
+        counts: Dict['Set', int] = {}
+        queue = [item for item in items if not isinstance(item, str)]
+        seen = {s for s, _, _ in queue}
+        for s, depth, force in queue:
+            if expand(s, depth, force):
+                for e in children[s][:max_elements]:
+                    counts[e] = counts.get(e, 0) + 1
+                    if e not in seen:
+                        seen.add(e)
+                        queue.append((e, depth + 1, False))
+        for s, count in counts.items():
+            if count > 1 and s.ordinal is None:
+                labels[s] = 0
+    defined = 0
+    parts: List[str] = []
+    length = 0
+    stack = items[::-1]
+    while stack and (max_chars is None or length <= max_chars):
+        item = stack.pop()
+        if isinstance(item, str):
+            text = item
+        else:
+            s, depth, force = item
+            label = labels.get(s)
+            if label:
+                text = f'#{label}#'
+            elif not expand(s, depth, force):
+                if s.ordinal is not None and not force:
+                    text = str(s.ordinal)
+                else:
+                    text = '{...}' if s.elements else '{}'
+            else:
+                elements = children[s]
+                text = '{'
+                if label is not None:
+                    defined += 1
+                    labels[s] = label = defined
+                    text = f'#{label}={{'
+                stack.append('}')
+                if max_elements is not None and len(elements) > max_elements:
+                    stack.append(', ...' if max_elements else '...')
+                    elements = elements[:max_elements]
+                for i in range(len(elements) - 1, -1, -1):
+                    stack.append((elements[i], depth + 1, False))
+                    if i:
+                        stack.append(', ')
+        parts.append(text)
+        length += len(text)
+    text = ''.join(parts)
+    if max_chars is not None and length > max_chars:
+        return text[:max_chars] + '...'
+    return text
+
+
+class SortKey:
+    __slots__ = ['rank', 'elements']
+
+    def __init__(self, s: 'Set'):
+        self.rank = s.rank
+        self.elements = tuple(sorted(s.elements, key=_sort_key, reverse=True))
+
+    def __lt__(self, other) -> bool:
+        # The first differing elements decide, so the comparison of
+        # sub-sets is a loop rather than a recursion.
+        a, b = self, other
+        while True:
+            if isinstance(b, int):
+                return False
+            if isinstance(a, int):
+                return True
+            if a.rank != b.rank:
+                return a.rank < b.rank
+            for x, y in zip(a.elements, b.elements):
+                if x is not y:
+                    break
+            else:
+                return len(a.elements) < len(b.elements)
+            a, b = x._key, y._key
+            if isinstance(a, int) and isinstance(b, int):
+                return a < b
+
+    def __gt__(self, other) -> bool:
+        if isinstance(other, int):
+            return True
+        return other < self
+
+
+def _sort_key(s: 'Set'):
+    return s.sort_key
+
+
+def _compute_key(s: 'Set'):
+    return SortKey(s)
+
+
+def _compute_digest(s: 'Set') -> bytes:
+    # Element digests are sorted so that the digest does not depend on the
+    # iteration order of the frozenset, which changes between processes.
+    h = hashlib.blake2b(digest_size=16, person=b'zerkel-set')
+    for digest in sorted(e._digest for e in s.elements):
+        h.update(digest)
+    return h.digest()
+
+
+def _compute_value(s: 'Set') -> int:
+    if s._code is not None:
+        return s._code
+    return sum(1 << e._value for e in s.elements)
+
+
 class Set:
     __slots__ = [
         "elements", "_cardinal", "_rank", "_size", "_ordinal", "_hash",
-        "_is_singleton", "_is_transitive", "_is_tuple", "_value"
+        "_is_singleton", "_is_transitive", "_is_tuple", "_value", "_code",
+        "_key", "_digest", "__weakref__"
     ]
     
-    syntax = _syntax()
-    cache: Dict[frozenset, 'Set'] = {}
+    cache = InternTable(maxsize=1 << 16)
+    codes = InternTable(maxsize=0)
+    # Sets whose Ackermann code fits in code_bits bits are also indexed by
+    # their code, so membership and adjunction become bitwise operations.
+    code_bits: int = 4096
     
     @classmethod
     def clear_cache(cls):
-        cls.cache.clear()
+        cls.cache.release()
+
+    @classmethod
+    def cache_stats(cls) -> InternStats:
+        return cls.cache.stats()
 
     def __new__(cls, *elements):
-        key = frozenset(elements)
-        try:
-            return cls.cache[key]
-        except KeyError:
-            instance = object.__new__(cls)
-            cls.cache[key] = instance
-            instance.elements = key
-            instance.init()
-            return instance
+        return cls._intern(frozenset(elements))
+
+    @classmethod
+    def _intern(cls, key: frozenset):
+        instance = cls.cache.get(key)
+        if instance is None:
+            instance = cls.cache.intern(key, cls._create)
+        return instance
+
+    @classmethod
+    def _create(cls, key: frozenset):
+        instance = object.__new__(cls)
+        instance.elements = key
+        instance.init()
+        if instance._code is not None:
+            cls.codes.add(instance._code, instance)
+        return instance
 
     def __init__(self, *elements):
         pass
@@ -87,6 +365,22 @@ class Set:
         self._is_tuple = NOT_COMPUTED_YET
         self._hash = NOT_COMPUTED_YET
         self._value = NOT_COMPUTED_YET
+        self._digest = NOT_COMPUTED_YET
+        self._code = self._compute_code()
+        self._key = NOT_COMPUTED_YET if self._code is None else self._code
+
+    def _compute_code(self):
+        code = 0
+        for element in self.elements:
+            c = element._code
+            if c is None or c >= self.code_bits:
+                return None
+            code |= 1 << c
+        return code
+
+    @property
+    def code(self) -> _Optional[int]:
+        return self._code
 
     @property
     def cardinal(self):
@@ -94,29 +388,56 @@ class Set:
             self._cardinal = len(self.elements)
         return self._cardinal
 
+    def _bottom_up(self, slot: str):
+        """
+        Sub-sets of self (self included) whose slot is not computed yet,
+        listed such that every set comes after all of its elements.
+        """
+        order = []
+        seen = set()
+        stack = [(self, False)]
+        while stack:
+            s, expanded = stack.pop()
+            if expanded:
+                order.append(s)
+            elif id(s) not in seen and getattr(s, slot) is NOT_COMPUTED_YET:
+                seen.add(id(s))
+                stack.append((s, True))
+                for e in s.elements:
+                    if id(e) not in seen and getattr(e, slot) is NOT_COMPUTED_YET:
+                        stack.append((e, False))
+        return order
+
+    def _compute(self, slot: str, compute):
+        for s in self._bottom_up(slot):
+            setattr(s, slot, compute(s))
+        return getattr(self, slot)
+
     @property
     def rank(self):
         if self._rank is NOT_COMPUTED_YET:
-            if self.elements:
-                self._rank = max(element.rank for element in self.elements) + 1
-            else:
-                self._rank = 0
+            return self._compute('_rank', _compute_rank)
         return self._rank
 
     @property
     def size(self):
         if self._size is NOT_COMPUTED_YET:
-            self._size = 1 + sum(u.size for u in self.elements)
+            return self._compute('_size', _compute_size)
         return self._size
 
+    @property
+    def sort_key(self):
+        # The Ackermann code for small sets, a SortKey for the others. Small
+        # sets always come first since a set without a code has a value of
+        # at least 2 ** code_bits.
+        if self._key is NOT_COMPUTED_YET:
+            return self._compute('_key', _compute_key)
+        return self._key
+
     @property
     def ordinal(self):
         if self._ordinal is NOT_COMPUTED_YET:
-            n = len(self.elements)
-            ords = set(range(n))
-            for element in self.elements:
-                ords.discard(element.ordinal)
-            self._ordinal = n if not ords else None
+            return self._compute('_ordinal', _compute_ordinal)
         return self._ordinal
     
     @property
@@ -128,11 +449,7 @@ class Set:
     @property
     def is_transitive(self):
         if self._is_transitive is NOT_COMPUTED_YET:
-            self._is_transitive = True
-            if self.elements:
-                for element in self.elements:
-                    if not self.is_upset(element):
-                        self._is_transitive = False
+            self._is_transitive = all(self.is_upset(e) for e in self.elements)
         return self._is_transitive
 
     @property
@@ -152,20 +469,51 @@ class Set:
                     self._is_tuple = False
         return self._is_tuple
     
+    @property
+    def digest(self) -> bytes:
+        """128-bit structural digest, the same in every process."""
+        if self._digest is NOT_COMPUTED_YET:
+            return self._compute('_digest', _compute_digest)
+        return self._digest
+
     @property
     def value(self):
         if self._value is NOT_COMPUTED_YET:
-            self._value = sum(2**e.value for e in self)
+            return self._compute('_value', _compute_value)
         return self._value
 
     def contains(self, other: 'Set') -> bool:
+        if self._code is not None:
+            return other._code is not None and (self._code >> other._code) & 1 == 1
         return other in self.elements
+
+    def adjoin(self, other: 'Set') -> 'Set':
+        if self._code is not None and other._code is not None and other._code < self.code_bits:
+            s = self.codes.get(self._code | (1 << other._code))
+            if s is not None:
+                return s
+        return self._intern(self.elements | {other})
+
+    @classmethod
+    def union(cls, *sets: 'Set') -> 'Set':
+        code = 0
+        for s in sets:
+            if s._code is None:
+                return cls._intern(frozenset().union(*(s.elements for s in sets)))
+            code |= s._code
+        s = cls.codes.get(code)
+        if s is None:
+            s = cls._intern(frozenset().union(*(t.elements for t in sets)))
+        return s
     
     def is_subset(self, other: 'Set') -> bool:
-        return all(e in other for e in self)
+        return self.elements <= other.elements
 
     def is_upset(self, other: 'Set') -> bool:
-        return all(e in self for e in other)
+        return self.elements >= other.elements
+
+    def __contains__(self, other) -> bool:
+        return isinstance(other, Set) and self.contains(other)
 
     def __iter__(self):
         yield from self.elements
@@ -174,14 +522,7 @@ class Set:
         return self.cardinal
 
     def __lt__(self, other):
-        if self.rank == other.rank:
-            s, o = sorted(self, reverse=True), sorted(other, reverse=True)
-            for a, b in zip(s, o):
-                if a != b:
-                    return a < b
-            if len(self) != len(other):
-                return len(self) < len(other)
-        return self.rank < other.rank
+        return self.sort_key < other.sort_key
 
     def __eq__(self, other):
         if self is other:
@@ -197,14 +538,23 @@ class Set:
             self._hash = hash(self.elements)
         return self._hash
 
-    def to_string(self, format_ordinal=False, format_tuple=False):
+    def to_string(self, format_ordinal=False, format_tuple=False,
+                  max_depth: _Optional[int] = None,
+                  max_chars: _Optional[int] = None,
+                  max_elements: _Optional[int] = None, share=False):
+        """
+        Nested sets deeper than max_depth are written {...}, only the first
+        max_elements elements of a set are written and the text is cut after
+        max_chars characters. With share, a sub-set occurring more than once
+        is labelled #n= the first time and written #n# afterwards.
+        """
         if format_ordinal and self.ordinal is not None:
             return self.as_ordinal()
         if format_tuple and self.is_tuple:
-            return self.as_tuple()
-        if not self.elements:
-            return '{}'
-        return str(set(self.elements))
+            items = _tuple_items(self._as_tuple(), 1)
+        else:
+            items = [(self, 0, True)]
+        return _write(items, max_depth, max_chars, max_elements, share)
 
     def __str__(self):
         return self.to_string(format_ordinal=True)
@@ -215,54 +565,39 @@ class Set:
     def as_tuple(self):
         return str(self._as_tuple())
 
-    def _build_tree(self):
-        this = '.' if self.ordinal is None else str(self.ordinal)
-        if len(self) == 0:
-            return ([this], len(this))
-        elif len(self) == 1:
-            x, *_ = [u._build_tree() for u in self]
-            b, s = x
-            size = max(len(this), s)
-            this = this.center(size)
-            mid = '║'.center(size)
-            b = [u.center(size) for u in b]
-            return ([this, mid, *b], size)
-        children = [u._build_tree() for u in sorted(self)]
-        x, *y = children
-        size = max(len(this), sum(u[1] for u in children) + len(y))
-        middle = size // 2
-        this = this.center(size)
-        body, length = x
-        links = ' ' * (length // 2) + '╔'
-        roots = []
-        for b, s in y:
-            length += 1
-            roots.append(length + s // 2)
-            for i in range(len(body)):
-                body[i] += ' '
-            body += [' ' * length for _ in range(len(b) - len(body))]
-            b += [' ' * s for _ in range(len(body) - len(b))]
-            for i, l in enumerate(b):
-                body[i] += l
-            length += s
-        for i, r in enumerate(roots):
-            if len(links) <= middle and r > middle:
-                links += '═' * (middle - len(links)) + '╩' + '═' * (r - middle - 1)
+    def _build_tree(self, max_depth: _Optional[int] = None,
+                    max_elements: _Optional[int] = None):
+        # Blocks are computed once per (set, depth) and never mutated, so
+        # shared sub-sets are laid out once.
+        blocks: Dict[Tuple[Set, int], Tuple[List[str], int]] = {}
+        stack = [(self, 0, False)]
+        while stack:
+            s, depth, expanded = stack.pop()
+            if (s, depth) in blocks:
+                continue
+            elements = sorted(s, key=_sort_key)
+            if max_elements is not None and len(elements) > max_elements:
+                hidden = len(elements) - max_elements
+                elements = elements[:max_elements]
             else:
-                links += '═' * (r - len(links))
-            if r == middle:
-                links += '╬'
-            elif i < len(roots) - 1:
-                links += '╦'
+                hidden = 0
+            if max_depth is not None and depth >= max_depth and elements:
+                blocks[s, depth] = _tree_block(_tree_label(s), [(['…'], 1)])
+            elif expanded:
+                children = [blocks[e, depth + 1] for e in elements]
+                if hidden:
+                    children.append(([f'+{hidden}'], len(f'+{hidden}')))
+                blocks[s, depth] = _tree_block(_tree_label(s), children)
             else:
-                links += '╗'
-        links += ' ' * (size - len(links))
-        body = [u.center(size) for u in body]
-        return ([this, links, *body], size)
-    
-    def as_tree(self):
-        return '\n'.join(boxify(self._build_tree()[0]))
-    
+                stack.append((s, depth, True))
+                stack.extend((e, depth + 1, False) for e in elements
+                             if (e, depth + 1) not in blocks)
+        return blocks[self, 0]
+
+    def as_tree(self, max_depth: _Optional[int] = None,
+                max_elements: _Optional[int] = None):
+        return '\n'.join(boxify(self._build_tree(max_depth, max_elements)[0]))
+
     def _as_tuple(self):
         if len(self) == 1:
             x, *_ = self
@@ -282,50 +617,112 @@ class Set:
 
     @classmethod
     def generate(cls, n: int):
-        elt = [cls.generate(i) for i in range(n.bit_length()) if n & (1 << i)]
-        return Set(*elt)
+        built: Dict[int, Set] = {}
+        stack = [n]
+        while stack:
+            code = stack.pop()
+            if code in built:
+                continue
+            s = cls.codes.get(code)
+            built[code] = s
+            if s is None:
+                stack.extend(i for i in range(code.bit_length()) if code >> i & 1)
+        for code in sorted(built):
+            if built[code] is None:
+                elt = (built[i] for i in range(code.bit_length()) if code >> i & 1)
+                built[code] = cls._intern(frozenset(elt))
+        return built[n]
     
     @classmethod
     def generate_all(cls, n: int):
-        for i in range(n):
-            yield Set.generate(i)
+        yield from cls.generate_range(0, n)
     
     @classmethod
     def generate_range(cls, start, end: int, step: int = 1):
-        for i in range(start, end, step):
-            yield Set.generate(i)
+        codes = range(start, end, step)
+        if not codes:
+            return
+        base: List[Set] = []
+        cls._extend_base(base, max(codes[0], codes[-1]).bit_length())
+        for i in codes:
+            yield cls._generate_from_base(i, base)
+
+    @classmethod
+    def generate_many(cls, start, end: int, step: int = 1) -> List['Set']:
+        return list(cls.generate_range(start, end, step))
+
+    @classmethod
+    def _extend_base(cls, base: List['Set'], n: int):
+        # base[i] is the set of code i, every code needed to build the sets
+        # of codes below 2 ** n is built once from the previous ones.
+        for i in range(len(base), n):
+            base.append(cls._generate_from_base(i, base))
+
+    @classmethod
+    def _generate_from_base(cls, n: int, base: List['Set']):
+        s = cls.codes.get(n)
+        if s is None:
+            s = cls._intern(frozenset(
+                base[i] for i in range(n.bit_length()) if n >> i & 1
+            ))
+        return s
             
     @classmethod
     def generate_ordinal(cls, ordinal: int):
         result = Set()
         for i in range(ordinal):
-            result = Set(*result, result)
+            result = result.adjoin(result)
         return result
 
     @classmethod
     def generate_from_base(cls, depth: int, base: 'Set'):
-        if depth <= 0:
-            return base
-        return cls(base, cls.generate_from_base(depth - 1, base))
+        result = base
+        for _ in range(depth):
+            result = cls(base, result)
+        return result
+
+    @classmethod
+    def generate_rank(cls, rank: int, start: int = 0, stop: int = None):
+        offset = cls._rank_offset(rank)
+        if stop is None or (offset + stop - 1).bit_length() > offset:
+            stop = (1 << offset) - offset
+        yield from cls.generate_range(offset + start, offset + stop)
 
     @classmethod
-    def generate_rank(cls, rank: int):
-        for i in cls.values_of_trees_of_heigh_n(rank):
-            yield Set.generate(i)
+    def index_of(cls, s: 'Set') -> int:
+        return s.value - cls._rank_offset(s.rank)
+
+    @classmethod
+    def set_at(cls, rank: int, index: int) -> 'Set':
+        offset = cls._rank_offset(rank)
+        if index < 0 or (offset + index).bit_length() > offset:
+            raise IndexError(f'No set of rank {rank} at index {index}')
+        return cls.generate(offset + index)
+
+    @staticmethod
+    def _rank_offset(rank: int) -> int:
+        # The sets of rank below n are exactly the sets of value below
+        # offset(n), with offset(0) = 0 and offset(n + 1) = 2 ** offset(n).
+        # The sets of a given rank are then ordered by value.
+        offset = 0
+        for _ in range(rank):
+            offset = 1 << offset
+        return offset
 
     @classmethod
     def generate_tuple(cls, x, y, *args):
-        if args:
-            return Set(Set(x), Set(x, cls.generate_tuple(y, *args)))
-        if x == y:
-            return Set(Set(x))
-        return Set(Set(x), Set(x, y))
+        *head, x, y = x, y, *args
+        result = Set(Set(x)) if x == y else Set(Set(x), Set(x, y))
+        for x in reversed(head):
+            result = Set(Set(x), Set(x, result))
+        return result
 
     @classmethod
     def generate_singleton(cls, depth: int):
-        if depth <= 0:
-            return Set()
-        return Set(cls.generate_singleton(depth - 1))
+        result = Set()
+        for _ in range(depth):
+            result = Set(result)
+        return result
 
     @classmethod
     def generate_complete(cls, rank: int):
@@ -333,16 +730,17 @@ class Set:
     
     @classmethod
     def generate_random(cls, rank: int):
-        result = cls._build_number_of_rooted_identity_trees_of_height_n(rank)
-        a, b = sum(result[:-1]), sum(result)
-        value = random.randrange(a, b)
-        return Set.generate(value)
+        index = random.randrange(cls.number_of_trees_of_heigh_n(rank))
+        return cls.set_at(rank, index)
 
     @classmethod
     def generate_transitive(cls, n: int):
         g = cls._generate_transitive_id()
+        base: List[Set] = []
         for _ in range(n):
-            yield cls.generate(next(g))
+            i = next(g)
+            cls._extend_base(base, i.bit_length())
+            yield cls._generate_from_base(i, base)
 
     @staticmethod
     def _generate_transitive_id():
@@ -355,11 +753,12 @@ class Set:
                     i |= j
 
     @classmethod
-    def parse(cls, text: str):
-        try:
-            return cls.syntax.parseString(text)[0]
-        except ParseException as e:
-            raise SetParsingException(text, e.col)
+    def parse(cls, text: str) -> 'Set':
+        return _parse_literals(text, many=False)[0]
+
+    @classmethod
+    def parse_many(cls, text: str) -> List['Set']:
+        return _parse_literals(text, many=True)
     
     @staticmethod
     def _build_number_of_rooted_identity_trees_of_height_n(n):
@@ -378,8 +777,12 @@ class Set:
     
     @classmethod
     def values_of_trees_of_heigh_n(cls, n):
+        yield from range(*cls._bounds_of_trees_of_heigh_n(n))
+
+    @classmethod
+    def _bounds_of_trees_of_heigh_n(cls, n):
         a038081 = cls._build_number_of_rooted_identity_trees_of_height_n(n)
-        yield from range(sum(a038081[:-1]), sum(a038081))
+        return sum(a038081[:-1]), sum(a038081)
     
     @classmethod
     def number_of_trees_of_heigh_n(cls, n):
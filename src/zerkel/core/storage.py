@@ -0,0 +1,181 @@
+import gc
+import mmap
+import struct
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from zerkel.core.set import Set
+
+
+# File layout, all integers are little endian:
+#   header    magic, version, width of an element index, number of distinct
+#             sets, number of element indices and number of top-level sets
+#   offsets   (sets + 1) uint64, the elements of the set i are
+#             elements[offsets[i]:offsets[i + 1]]
+#   elements  indices of uint32 or uint64, depending on the width
+#   roots     uint64 indices of the top-level sets
+# Every distinct sub-set is written once and after all of its elements.
+MAGIC = b'ZSET'
+VERSION = 1
+HEADER = struct.Struct('<4sBB2xQQQ')
+
+
+class SetFileException(ValueError):
+    def __init__(self, path, reason):
+        self.path = path
+        self.reason = reason
+
+    def __str__(self):
+        return f'Invalid set file {self.path}: {self.reason}'
+
+
+def dump_sets(sets: Iterable[Set], path: str) -> None:
+    # Sets are indexed by id, the written list keeps them alive meanwhile.
+    index: Dict[int, int] = {}
+    written: List[Set] = []
+    offsets: List[int] = [0]
+    elements: List[int] = []
+    roots: List[int] = []
+    for root in sets:
+        stack = [(root, False)]
+        while stack:
+            s, expanded = stack.pop()
+            if expanded:
+                if id(s) not in index:
+                    elements.extend(sorted([index[id(e)] for e in s.elements]))
+                    offsets.append(len(elements))
+                    index[id(s)] = len(written)
+                    written.append(s)
+            elif id(s) not in index:
+                stack.append((s, True))
+                stack.extend((e, False) for e in s.elements if id(e) not in index)
+        roots.append(index[id(root)])
+    width = 4 if len(index) < 1 << 32 else 8
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, width, len(index),
+                            len(elements), len(roots)))
+        f.write(np.asarray(offsets, dtype='<u8').tobytes())
+        f.write(np.asarray(elements, dtype=f'<u{width}').tobytes())
+        f.write(np.asarray(roots, dtype='<u8').tobytes())
+
+
+def load_sets(path: str) -> List[Set]:
+    with SetFile(path) as f:
+        return f.load()
+
+
+class SetFile:
+    """
+    Memory-mapped reader of a file written by ``dump_sets``.
+
+    ``f[i]`` interns the i-th top-level set and only the sub-sets it needs,
+    ``f.load()`` interns everything in a single pass.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SetFileException(path, 'empty file')
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise SetFileException(path, 'truncated header')
+        magic, version, width, n, e, r = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or width not in (4, 8):
+            self.close()
+            raise SetFileException(path, 'unknown format')
+        position = HEADER.size
+        if len(self._mmap) != position + 8 * (n + 1) + width * e + 8 * r:
+            self.close()
+            raise SetFileException(path, 'truncated data')
+        self._offsets = np.frombuffer(self._mmap, '<u8', n + 1, position)
+        position += 8 * (n + 1)
+        self._elements = np.frombuffer(self._mmap, f'<u{width}', e, position)
+        position += width * e
+        self._roots = np.frombuffer(self._mmap, '<u8', r, position)
+        self._sets: Dict[int, Set] = {}
+
+    def __len__(self) -> int:
+        return len(self._roots)
+
+    def __getitem__(self, i: int) -> Set:
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        return self.node(int(self._roots[i]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def _children(self, i: int) -> List[int]:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        if not start <= end <= len(self._elements):
+            raise SetFileException(self.path, f'set {i} has elements out of range')
+        children = self._elements[start:end].tolist()
+        # Sets are written after their elements, which also rules out cycles.
+        if children and max(children) >= i:
+            raise SetFileException(self.path, f'set {i} has an element {max(children)} '
+                                              f'not written before it')
+        return children
+
+    def node(self, i: int) -> Set:
+        if not 0 <= i < len(self._offsets) - 1:
+            raise SetFileException(self.path, f'set {i} out of range')
+        sets = self._sets
+        stack = [(i, False)]
+        while stack:
+            j, expanded = stack.pop()
+            if expanded:
+                sets[j] = Set._intern(frozenset(sets[k] for k in self._children(j)))
+            elif j not in sets:
+                stack.append((j, True))
+                stack.extend((k, False) for k in self._children(j) if k not in sets)
+        return sets[i]
+
+    def load(self) -> List[Set]:
+        self._check()
+        offsets = self._offsets.tolist()
+        elements = self._elements.tolist()
+        sets: List[Set] = []
+        intern = Set._intern
+        # Sets never form reference cycles, collecting while millions of
+        # them are allocated only costs time.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for i in range(len(offsets) - 1):
+                children = elements[offsets[i]:offsets[i + 1]]
+                sets.append(intern(frozenset([sets[k] for k in children])))
+        finally:
+            if enabled:
+                gc.enable()
+        self._sets = dict(enumerate(sets))
+        return [sets[i] for i in self._roots.tolist()]
+
+    def _check(self) -> None:
+        offsets = self._offsets.astype(np.int64)
+        if offsets[0] != 0 or offsets[-1] != len(self._elements) or np.any(np.diff(offsets) < 0):
+            raise SetFileException(self.path, 'offsets out of range')
+        parents = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        invalid = np.flatnonzero(self._elements >= parents)
+        if len(invalid):
+            i = int(parents[invalid[0]])
+            raise SetFileException(self.path, f'set {i} has an element '
+                                              f'{int(self._elements[invalid[0]])} not written before it')
+        if np.any(self._roots >= len(offsets) - 1):
+            raise SetFileException(self.path, 'root out of range')
+
+    def close(self) -> None:
+        self._offsets = self._elements = self._roots = None
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> 'SetFile':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -1,6 +1,6 @@
 from typing import Dict, Tuple, Callable
 
-from zerkel.core import Set, Node
+from zerkel.core import Set, Node, WellFounded, closure, ordinal
 
 from zerkel.interpreter import parse
 
@@ -52,10 +52,10 @@ _blacklist = {
 }
 
 
-tc = (lambda r: lambda x: r(r, x))(lambda f, x: Set(x, *(v for u in x for v in f(f, u))))
-rank = (lambda r: lambda x: r(r, x))(lambda f, x: tc(Set(*(v for u in x for v in f(f, u)))))
-rtc = (lambda r: lambda x: r(r, x))(lambda f, x: Set(x, *(v for u in x for v in f(f, u)), Set(x, *(v for u in x for v in f(f, u)))))
-rxyx = (lambda r: lambda x: r(r, x))(lambda f, x: (lambda a, b: Set(*a, b, a))(Set(*(v for u in x for v in f(f, u))), x))
+tc = closure
+rank = lambda x: ordinal(x.rank + 1)
+rtc = WellFounded(lambda a, x: (lambda b: b.adjoin(b))(a.adjoin(x)))
+rxyx = WellFounded(lambda a, x: a.adjoin(x).adjoin(a))
 
 
 _programs: Dict[Tuple[int, int], Dict[str, Callable]] = {
@@ -130,8 +130,8 @@ _programs: Dict[Tuple[int, int], Dict[str, Callable]] = {
         'R!+<<E': lambda x: None, # Similar to R!+>I
         'R!>I<I': lambda x: None, # Similar to R!+>I
         'Ro++>I': rxyx,
-        'Ro+<I+': (lambda r: lambda x: r(r, x))(lambda f, x: (lambda a, b: Set(*b, Set(*a, b)))(Set(*(v for u in x for v in f(f, u))), x)),
-        'Ro+>I+': (lambda r: lambda x: r(r, x))(lambda f, x: (lambda a, b: Set(*a, Set(*a, b)))(Set(*(v for u in x for v in f(f, u))), x)),
+        'Ro+<I+': WellFounded(lambda a, x: x.adjoin(a.adjoin(x))),
+        'Ro+>I+': WellFounded(lambda a, x: a.adjoin(a.adjoin(x))),
         'o+<ER+': lambda x: Set(tc(x))
         }, 
     (6, 2): {
@@ -153,7 +153,7 @@ _programs: Dict[Tuple[int, int], Dict[str, Callable]] = {
         '!oR+++': lambda x, y: tc(Set(*x, y)) if x in y else Set(*x, y),
         'R!<+>+': lambda x, y: None, # ???
         'R!>+<+': lambda x, y: None, # ???
-        'RoR+R?': (lambda r: lambda x, y: r(r, x, y))(lambda f, x, y: (lambda a, u, v: Set(Set()) if u in v else tc(a))(Set(*(v for u in x for v in f(f, u, y))), x, y)), 
+        'RoR+R?': WellFounded(lambda a, x, y: Set(Set()) if x in y else tc(a)), 
         'o++<R+': lambda x, y: Set(*x, y, tc(y)),
         'o++>R+': lambda x, y: Set(*x, y, tc(x)),
         'o++<<E': lambda x, y: Set(*x, y, Set()),
@@ -211,9 +211,9 @@ _programs: Dict[Tuple[int, int], Dict[str, Callable]] = {
         'R!>R+>I': lambda x: None, # Rang du plus grand ordinal contenue dans l'ensemble + 1
         'R!<<E<I': lambda x: None,
         'RR!<+>+': lambda x: None,
-        # 'R>Ro+++': (lambda r: lambda x: r(r, x))((lambda g: lambda f, x: g(Set(*(v for u in x for v in f(f, u)))))(rtc)), # Very slow
-        'R>o+IR+': (lambda r: lambda x: r(r, x))(lambda f, x: (lambda a: Set(*a, tc(a)))(Set(*(v for u in x for v in f(f, u))))), 
-        'R>oR+R+': (lambda r: lambda x: r(r, x))(lambda f, x: tc(tc(Set(*(v for u in x for v in f(f, u)))))), # Also slow but a bit better than R>Ro+++
+        'R>Ro+++': WellFounded(lambda a, x: rtc(a)),
+        'R>o+IR+': WellFounded(lambda a, x: a.adjoin(tc(a))),
+        'R>oR+R+': WellFounded(lambda a, x: tc(tc(a))),
         'RRoR+R?': lambda x: None, # ???
         'Ro++<R+': lambda x: None, # Generate sets of rank rank(x) + 2
         'Ro++>R+': lambda x: None, # Same as previous but with missing elements so the representation of the set is bigger
@@ -6,7 +6,7 @@ from zerkel.core import (
     Set, Node, EmptySet, Identity, UnionPlus, IfThenElse, In, 
     Projection, Composition, Recursion
 )
-from zerkel.interpreter import interpret
+from zerkel.interpreter import interpret, Budget, BudgetExceeded
 
 from zerkel.generation.enumeration import blacklist
 
@@ -28,6 +28,10 @@ NO_IN_OPERATOR = False
 
 _constant_cache: Dict[Set, Node] = {Set(): EmptySet()}
 
+# Constants taking longer to compute are skipped, a step count keeps the
+# enumeration deterministic.
+CONSTANT_BUDGET = Budget(steps=1 << 20)
+
 
 def cache_generation(callback):
     _cache = {}
@@ -178,7 +182,10 @@ def _composition_can_be_simplified(p):
 
 
 def cache_constant(p):
-    r = interpret(p)
+    try:
+        r = interpret(p, budget=CONSTANT_BUDGET)
+    except BudgetExceeded:
+        return
     try:
         if p.size < _constant_cache[r].size:
             _constant_cache[r] = p
@@ -1,10 +1,17 @@
 from .main import (
-    parse, check, interpret, debug, step_by_step, table, 
-    benchmark, compare
+    parse, check, interpret, compile_program, debug, profile, attribute,
+    step_by_step,
+    table, benchmark, compare
 )
 
 from .functions import compile_functions
 from .interpreter import (
     Interpreter, StepCounter, Debugger, StepByStep, ClosedExpression, 
-    LazyExpression
+    LazyExpression, StrictEvaluator, BottomUpEvaluator
 )
+from .compiler import CompiledProgram
+from .vm import Assembler, Bytecode, VirtualMachine, AtomicInstructionCounter
+from .memo import ResultMemo, shared_memo
+from .budget import Budget, BudgetExceeded
+from .profiler import SamplingProfiler
+from .attribution import CostAttribution
@@ -0,0 +1,145 @@
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from tabulate import tabulate
+
+from zerkel.core import Node
+from zerkel.interpreter.interpreter import ATOMIC, Observer
+from zerkel.interpreter.profiler import node_label
+
+
+COLUMNS = ['exclusive steps', 'inclusive steps', 'exclusive time',
+           'inclusive time', 'exclusive sets', 'inclusive sets']
+
+
+class _Frame:
+    __slots__ = ['expression', 'node', 'path', 'steps', 'time', 'sets']
+
+    def __init__(self, expression, node: Node, path: str, steps: int,
+                 time: float, sets: int):
+        self.expression = expression
+        self.node = node
+        self.path = path
+        self.steps = steps
+        self.time = time
+        self.sets = sets
+
+
+class CostAttribution(Observer):
+    """
+    Attributes the atomic steps, counted as by AtomicStepCounter, the time
+    and the sets created by a run to the nodes of the program. Every expression on the stack is a frame of the
+    node it was built with, a compound of a composition, a recursion or
+    the whole program, whatever its node becomes while it is evaluated.
+    A step is exclusive to the frame on top of the stack and inclusive to
+    every frame on the stack, a node that is on the stack several times
+    is only counted once. The stacks of frames can be exported in the
+    collapsed format of flame graph tools. Costs add up over the runs.
+    """
+
+    def __init__(self):
+        self.exclusive: Dict[Node, List] = defaultdict(lambda: [0, 0.0, 0])
+        self.inclusive: Dict[Node, List] = defaultdict(lambda: [0, 0.0, 0])
+        self.stacks: Dict[str, List] = defaultdict(lambda: [0, 0.0, 0])
+        self.steps = 0
+        self._frames: List[_Frame] = []
+        self._active: Counter = Counter()
+        self._top: Optional[_Frame] = None
+        self._time = 0.0
+        self._sets = 0
+
+    def init(self):
+        self._frames = []
+        self._active.clear()
+        self._top = None
+        self._time = time.perf_counter()
+        self._sets = self.interpreter.created_sets()
+
+    def _charge(self, now: float, sets: int) -> None:
+        # Time and sets of the last step go to the frame it ran in.
+        top = self._top
+        if top is not None:
+            dt, ds = now - self._time, sets - self._sets
+            cost = self.exclusive[top.node]
+            cost[1] += dt
+            cost[2] += ds
+            cost = self.stacks[top.path]
+            cost[1] += dt
+            cost[2] += ds
+        self._time, self._sets = now, sets
+
+    def _pop(self, now: float, sets: int) -> None:
+        frame = self._frames.pop()
+        self._active[frame.node] -= 1
+        if not self._active[frame.node]:
+            cost = self.inclusive[frame.node]
+            cost[0] += self.steps - frame.steps
+            cost[1] += now - frame.time
+            cost[2] += sets - frame.sets
+
+    def notify(self):
+        now, sets = time.perf_counter(), self.interpreter.created_sets()
+        self._charge(now, sets)
+        stack = self.interpreter.stack.stack
+        frames = self._frames
+        # The stack only changes on top, by a pop or by pushes.
+        while frames and (len(frames) > len(stack)
+                          or stack[len(frames) - 1] is not frames[-1].expression):
+            self._pop(now, sets)
+        for k in range(len(frames), len(stack)):
+            e = stack[k]
+            node = e.origin
+            path = node_label(node, 40)
+            if frames:
+                path = frames[-1].path + ';' + path
+            frames.append(_Frame(e, node, path, self.steps, now, sets))
+            self._active[node] += 1
+        top = self._top = frames[-1]
+        # Only the atomic steps are counted, as by AtomicStepCounter, the
+        # time and the sets are those of every step.
+        e = top.expression
+        if not e.is_closed and isinstance(e.node, ATOMIC):
+            self.exclusive[top.node][0] += 1
+            self.stacks[top.path][0] += 1
+            self.steps += 1
+
+    def done(self):
+        now, sets = time.perf_counter(), self.interpreter.created_sets()
+        self._charge(now, sets)
+        while self._frames:
+            self._pop(now, sets)
+        self._top = None
+
+    def rows(self, sort: str = 'inclusive steps') -> List[list]:
+        """One row per node: its label then the COLUMNS, sorted by one of
+        them, in decreasing order."""
+        rows = []
+        for node in self.inclusive.keys() | self.exclusive.keys():
+            e, i = self.exclusive.get(node, [0, 0.0, 0]), self.inclusive.get(node, [0, 0.0, 0])
+            rows.append([node_label(node, 40), e[0], i[0], e[1], i[1], e[2], i[2]])
+        column = COLUMNS.index(sort) + 1
+        return sorted(rows, key=lambda row: row[column], reverse=True)
+
+    def table(self, sort: str = 'inclusive steps', limit: Optional[int] = 20,
+              format="fancy_grid") -> str:
+        return tabulate(self.rows(sort)[:limit], ['node', *COLUMNS],
+                        floatfmt='.6f', tablefmt=format)
+
+    def collapsed(self, weight: str = 'steps') -> str:
+        """Lines 'frame;frame;...;frame value' of the flame graph tools,
+        weighted by steps, time in microseconds or sets created."""
+        i = ('steps', 'time', 'sets').index(weight)
+        lines = []
+        for path, cost in self.stacks.items():
+            value = round(cost[1] * 1e6) if i == 1 else cost[i]
+            if value:
+                lines.append(f'{path} {value}')
+        return '\n'.join(lines)
+
+    def dump_collapsed(self, path: str, weight: str = 'steps') -> None:
+        with open(path, 'w') as f:
+            f.write(self.collapsed(weight) + '\n')
+
+    def __str__(self) -> str:
+        return self.table()
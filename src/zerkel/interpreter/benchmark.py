@@ -1,6 +1,7 @@
-from typing import List, Iterable, Sequence, Any
+from typing import List, Iterable, Sequence, Tuple, Any, Optional, Union as _Union
 
 import math
+import time
 from itertools import product
 from statistics import mean
 
@@ -12,8 +13,10 @@ import matplotlib.pyplot as plt
 from tabulate import tabulate
 
 from zerkel.interpreter.interpreter import Interpreter, Argument, AtomicStepCounter
+from zerkel.interpreter.memo import ResultMemo, resolve_memo
+from zerkel.interpreter.budget import Budget
 from zerkel.core import (
-    Node, Set, Visitable, NodeVisitor, EmptySet, Identity, 
+    Node, Set, ranks, Visitable, NodeVisitor, EmptySet, Identity, 
     UnionPlus, IfThenElse, Projection, Composition, 
     Recursion, Union, Merge
 )
@@ -32,15 +35,34 @@ def crop_node_str(node: Node, n=15) -> str:
 
 
 class Benchmark:
-    def __init__(self, node: Node, iterations: int, *args: Iterable[Argument]):
+    """
+    Number of atomic steps, and time in seconds without observers, of the
+    program for every combination of the arguments, evaluated with the
+    given strategy of the Interpreter. With a memo, see ResultMemo, the
+    values computed for the previous arguments and iterations are reused
+    and only what is left to compute is counted and timed, the times on a
+    copy of the memo going through the same values. A budget limits every
+    run, BudgetExceeded stops the benchmark.
+    """
+
+    def __init__(self, node: Node, iterations: int, *args: Iterable[Argument],
+                 strategy: str = 'lazy', memo: _Union[bool, ResultMemo, None] = None,
+                 budget: Optional[Budget] = None):
         self.node = node
         self.iterations = iterations
+        self.strategy = strategy
+        self.memo = resolve_memo(memo)
+        self.budget = budget
         self.args: List[List[Set]] = self._parse_arguments(*args)
+        self.times: np.ndarray
         self.table: np.ndarray = self.bench(*self.args)
     
     def _parse_arguments(self, *args: Iterable[Argument]) -> List[List[Set]]:
         result = []
         for arg in args:
+            if isinstance(arg, str):
+                result.append(Set.parse_many(arg))
+                continue
             t = []
             for e in arg:
                 if isinstance(e, Set):
@@ -52,23 +74,44 @@ class Benchmark:
             result.append(t)
         return result
     
+    def _run(self, x, counted: bool, memo: Optional[ResultMemo] = None) -> Tuple[int, float]:
+        interpreter = Interpreter(self.node, strategy=self.strategy, memo=memo,
+                                  budget=self.budget)
+        step_counter = AtomicStepCounter()
+        if counted:
+            interpreter.add_observer(step_counter)
+        start = time.perf_counter()
+        interpreter.interpret(*x)
+        return step_counter.steps if counted else 0, time.perf_counter() - start
+
     def bench(self, *args) -> np.ndarray:
         result: List[int] = []
+        times: List[float] = []
+        # A second evaluation would only find the memoized value, the runs
+        # timed without observers use a memo of their own.
+        timing = self.memo.copy() if self.memo is not None else None
         for x in product(*args):
-            interpreter = Interpreter(self.node)
-            interpreter.interpret(*x)
-            temp = []
-            for _ in range(self.iterations):
-                interpreter = Interpreter(self.node)
-                step_counter = AtomicStepCounter()
-                interpreter.add_observer(step_counter)
-                interpreter.interpret(*x)
-                temp.append(step_counter.steps)
-            result.append(sum(temp))
-        return np.asarray(result).reshape(tuple(len(arg) for arg in self.args))
+            steps, elapsed = 0, 0.0
+            if self.memo is not None:
+                for _ in range(self.iterations):
+                    elapsed += self._run(x, False, timing)[1]
+                    steps += self._run(x, True, self.memo)[0]
+            else:
+                self._run(x, False)
+                for _ in range(self.iterations):
+                    elapsed += self._run(x, False)[1]
+                    steps += self._run(x, True)[0]
+            result.append(steps)
+            times.append(elapsed)
+        shape = tuple(len(arg) for arg in self.args)
+        self.times = np.asarray(times).reshape(shape)
+        return np.asarray(result).reshape(shape)
 
     def format(self, format="fancy_grid") -> str:
         return self._format(self.args, self.table, format)
+
+    def format_times(self, format="fancy_grid") -> str:
+        return self._format(self.args, self.times, format)
     
     def _format(self, args, table, f):
         if len(args) == 1:
@@ -83,7 +126,7 @@ class Benchmark:
     
     def plot(self):
         if len(self.args) == 1:
-            x = [e.rank + 1 for e in self.args[0]]
+            x = ranks(self.args[0]) + 1
             y = [e for e in self.table]
             plt.xlabel('Rank of the input set')
             plt.ylabel('Number of steps')
@@ -92,9 +135,8 @@ class Benchmark:
             coef = coefficient(np.log(x), np.log(y))
             plt.plot(x, y, label=f"Coefficient {coef:.3f}")
         elif len(self.args) == 2:
-            x, y = zip(*product(*self.args))
-            x = [e.rank for e in x]
-            y = [e.rank for e in y]
+            x, y = np.meshgrid(ranks(self.args[0]), ranks(self.args[1]), indexing='ij')
+            x, y = x.flatten(), y.flatten()
             z = [v for v in self.table.flatten()]
             c = np.linspace(min(z), max(z), len(x))
             fig = plt.figure()
@@ -117,15 +159,22 @@ class Benchmark:
 
 
 class Compare:
-    def __init__(self, node1: Node, node2: Node, iterations: int, *args: Iterable[Argument]):
+    """
+    Benchmarks of two programs, or of one program with two strategies, on
+    the same arguments.
+    """
+
+    def __init__(self, node1: Node, node2: Node, iterations: int, *args: Iterable[Argument],
+                 strategies: Tuple[str, str] = ('lazy', 'lazy')):
         self.node1 = node1
         self.node2 = node2
-        self.benchmark1 = Benchmark(node1, iterations, *args)
-        self.benchmark2 = Benchmark(node2, iterations, *args)
+        self.strategies = strategies
+        self.benchmark1 = Benchmark(node1, iterations, *args, strategy=strategies[0])
+        self.benchmark2 = Benchmark(node2, iterations, *args, strategy=strategies[1])
 
     def plot(self):
-        x1 = [e.rank for e in self.benchmark1.args[0]]
-        x2 = [e.rank for e in self.benchmark2.args[0]]
+        x1 = ranks(self.benchmark1.args[0])
+        x2 = ranks(self.benchmark2.args[0])
         y1 = [e for e in self.benchmark1.table]
         y2 = [e for e in self.benchmark2.table]
         plt.xlabel('Rank of the input set')
@@ -139,12 +188,22 @@ class Compare:
         plt.legend(title=f'Comparison of {self.node1} and {self.node2} (logarithmic scale)')
         plt.show()
 
+    def _label(self, node: Node, strategy: str) -> str:
+        label = crop_node_str(node)
+        if self.strategies[0] != self.strategies[1]:
+            label += f' ({strategy})'
+        return label
+
     def format(self, format="fancy_grid") -> str:
-        return self._format(self.benchmark1.args, self.benchmark1.table, 
-                            self.benchmark1.table, format)
-    
-    def _format(self, args, table1, table2, f):
-        return tabulate(zip(args[0], table1, table2), tablefmt=f)
+        b1, b2 = self.benchmark1, self.benchmark2
+        labels = (self._label(self.node1, self.strategies[0]),
+                  self._label(self.node2, self.strategies[1]))
+        headers = ['', *(f'steps {l}' for l in labels), *(f'time {l}' for l in labels)]
+        args = list(product(*b1.args))
+        rows = zip(args, b1.table.flatten(), b2.table.flatten(),
+                   b1.times.flatten(), b2.times.flatten())
+        return tabulate([[x[0] if len(x) == 1 else x, *r] for x, *r in rows],
+                        headers, tablefmt=format)
     
     def __str__(self) -> str:
         return self.format()
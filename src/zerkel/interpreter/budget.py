@@ -0,0 +1,42 @@
+from typing import Optional
+
+
+class Budget:
+    """
+    Limits of a single run of the Interpreter: a number of steps, a number
+    of seconds and a number of sets created, interned sets or ids of the
+    arena. None is no limit. The steps are checked before every step, the
+    time and the sets every ``every`` steps only.
+    """
+    __slots__ = ['steps', 'seconds', 'sets', 'every']
+
+    def __init__(self, steps: Optional[int] = None, seconds: Optional[float] = None,
+                 sets: Optional[int] = None, every: int = 1024):
+        if every < 1:
+            raise ValueError(f'every must be positive, got {every}')
+        self.steps = steps
+        self.seconds = seconds
+        self.sets = sets
+        self.every = every
+
+    def __str__(self) -> str:
+        limits = [f'{name}={getattr(self, name)!r}'
+                  for name in ('steps', 'seconds', 'sets') if getattr(self, name) is not None]
+        return f'Budget({", ".join(limits)})'
+
+    __repr__ = __str__
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, resource: str, limit, steps: int, seconds: float, sets: int, depth: int):
+        self.resource = resource
+        self.limit = limit
+        self.steps = steps
+        self.seconds = seconds
+        self.sets = sets
+        self.depth = depth
+
+    def __str__(self) -> str:
+        return (f'BudgetExceeded: {self.resource} budget of {self.limit} exceeded after '
+                f'{self.steps} steps, {self.seconds:.3f} s and {self.sets} sets created, '
+                f'stack depth {self.depth}')
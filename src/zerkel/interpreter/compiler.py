@@ -0,0 +1,252 @@
+from operator import itemgetter
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from zerkel.core import (
+    Node, SetArena, NodeVisitor, EmptySet, Identity, UnionPlus, IfThenElse,
+    In, Projection, Composition, Recursion, Union, Merge, Function
+)
+from zerkel.interpreter.interpreter import (
+    Argument, SetOperations, MismatchedNumberOfArguments, parse_arguments
+)
+from zerkel.interpreter.semantic_analyzer import UsedArguments, StrictArguments
+
+
+# A compiled program takes the tuple of its arguments and returns its value.
+# The arguments it does not use may be None, the lazy ones are Thunks.
+Compiled = Callable[[Tuple], Any]
+
+
+class Thunk:
+    """Argument computed the first time it is needed."""
+    __slots__ = ['function', 'parameters', 'value']
+
+    def __init__(self, function: Compiled, parameters: Any):
+        self.function = function
+        self.parameters = parameters
+
+    def __call__(self) -> Any:
+        if self.function is not None:
+            self.value = self.function(self.parameters)
+            self.function = self.parameters = None
+        return self.value
+
+
+class _Pending(Exception):
+    # Raised when the union of the recursive calls is needed before they
+    # have been computed.
+    def __init__(self, values: Dict, elements: List):
+        self.values = values
+        self.elements = elements
+
+
+class Compiler(NodeVisitor):
+    """
+    Compiles a checked program into nested closures. Projections select
+    the arguments and compositions call their compounds directly. As in the
+    Interpreter, an argument is only computed when it is needed: arguments
+    that are always needed are passed as values, the others as Thunks. A
+    recursion is a loop over the sub-sets of its first argument, the values
+    are memoized in the compiled program.
+    """
+
+    def __init__(self, sets):
+        self.sets = sets
+        self.used = UsedArguments()
+        self.strict = StrictArguments()
+        self.cache: Dict[Tuple[Node, FrozenSet[int]], Compiled] = {}
+        self.memos: List[Dict] = []
+        self.lazy: FrozenSet[int] = frozenset()
+        self.compiled: Compiled
+
+    def compile(self, node: Node, lazy: FrozenSet[int] = frozenset()) -> Compiled:
+        """Compiles node for arguments whose positions in lazy are Thunks."""
+        key = (node, lazy)
+        compiled = self.cache.get(key)
+        if compiled is None:
+            self.lazy = lazy
+            node.accept(self)
+            compiled = self.cache[key] = self.compiled
+        return compiled
+
+    @staticmethod
+    def _reader(i: int, lazy: FrozenSet[int]) -> Compiled:
+        if i in lazy:
+            return lambda p: p[i]()
+        return itemgetter(i)
+
+    def visit_function(self, function: Function):
+        # Intrinsics are callbacks of the interpreter, the definition is
+        # compiled instead.
+        self.compiled = self.compile(function.node, self.lazy)
+
+    def visit_empty_set(self, empty_set: EmptySet):
+        empty = self.sets.empty()
+        self.compiled = lambda p: empty
+
+    def visit_identity(self, identity: Identity):
+        self.compiled = self._reader(0, self.lazy)
+
+    def visit_union_plus(self, union_plus: UnionPlus):
+        adjoin = self.sets.adjoin
+        if self.lazy & {0, 1}:
+            x, y = self._reader(0, self.lazy), self._reader(1, self.lazy)
+            self.compiled = lambda p: adjoin(x(p), y(p))
+        else:
+            self.compiled = lambda p: adjoin(p[0], p[1])
+
+    def visit_if_then_else(self, if_then_else: IfThenElse):
+        contains = self.sets.contains
+        if self.lazy & {0, 1, 2, 3}:
+            x, y, u, v = (self._reader(i, self.lazy) for i in range(4))
+            self.compiled = lambda p: x(p) if contains(v(p), u(p)) else y(p)
+        else:
+            self.compiled = lambda p: p[0] if contains(p[3], p[2]) else p[1]
+
+    def visit_in(self, in_operator: In):
+        lazy, n = self.lazy, in_operator.arity
+        if in_operator.f is in_operator.g:
+            self.compiled = self.compile(in_operator.f, lazy)
+            return
+        u, v = self._reader(n - 2, lazy), self._reader(n - 1, lazy)
+        f, g = self.compile(in_operator.f, lazy), self.compile(in_operator.g, lazy)
+        contains = self.sets.contains
+        self.compiled = lambda p: f(p) if contains(v(p), u(p)) else g(p)
+
+    def visit_projection(self, projection: Projection):
+        start = projection.left
+        stop = start + projection.f.arity
+        lazy = self.lazy
+        if isinstance(projection.f, Identity):
+            self.compiled = self._reader(start, lazy)
+            return
+        f = self.compile(projection.f, frozenset(i - start for i in lazy if start <= i < stop))
+        self.compiled = lambda p: f(p[start:stop])
+
+    def visit_composition(self, composition: Composition):
+        lazy = self.lazy
+        used, strict = self.used.of(composition.f), self.strict.of(composition.f)
+        gs = [self.compile(g, lazy) if i in used else None
+              for i, g in enumerate(composition.g)]
+        if isinstance(composition.f, IfThenElse):
+            # Only the chosen branch is computed, the condition neither when
+            # the Interpreter skips it, for the same compounds.
+            x, y, u, v = gs
+            contains = self.sets.contains
+            if composition.g[0] is composition.g[1]:
+                self.compiled = x
+            elif composition.g[2] is composition.g[3]:
+                self.compiled = y
+            else:
+                self.compiled = lambda p: x(p) if contains(v(p), u(p)) else y(p)
+            return
+        f = self.compile(composition.f, used - strict)
+        if len(gs) == 1 and strict:
+            g, = gs
+            self.compiled = lambda p: f((g(p),))
+        elif len(gs) == 2 and len(strict) == 2:
+            g, h = gs
+            self.compiled = lambda p: f((g(p), h(p)))
+        else:
+            kinds = [(g, i in strict) for i, g in enumerate(gs)]
+            self.compiled = lambda p: f(tuple([
+                None if g is None else g(p) if value else Thunk(g, p)
+                for g, value in kinds
+            ]))
+
+    def visit_recursion(self, recursion: Recursion):
+        lazy = self.lazy
+        used, strict = self.used.of(recursion.g), self.strict.of(recursion.g)
+        if 0 not in used:
+            # The recursive calls are never needed.
+            g = self.compile(recursion.g, frozenset(i + 1 for i in lazy))
+            self.compiled = lambda p: g((None, *p))
+            return
+        # The arguments are the keys of the memoized values, they are all
+        # computed. The union of the recursive calls is lazy unless it is
+        # always needed.
+        g = self.compile(recursion.g, frozenset() if 0 in strict else frozenset((0,)))
+        z = self._reader(0, lazy)
+        x = [self._reader(i, lazy) if i + 1 in used else None
+             for i in range(1, recursion.arity)]
+        sets = self.sets
+        elements, union = sets.elements, sets.union
+        memo: Dict[Tuple, Dict] = {}
+        self.memos.append(memo)
+
+        def compiled(p):
+            key = tuple([None if read is None else read(p) for read in x])
+            values = memo.get(key)
+            if values is None:
+                values = memo[key] = {}
+
+            def merge(s):
+                children = list(elements(s))
+                pending = [e for e in children if e not in values]
+                if pending:
+                    raise _Pending(values, pending)
+                return union(*[values[e] for e in children])
+
+            root = z(p)
+            stack = [root]
+            while stack:
+                s = stack[-1]
+                if s in values:
+                    stack.pop()
+                    continue
+                try:
+                    if 0 in strict:
+                        u = merge(s)
+                    else:
+                        u = Thunk(merge, s)
+                    values[s] = g((u, s, *key))
+                except _Pending as e:
+                    if e.values is not values:
+                        raise
+                    stack.extend(e.elements)
+                    continue
+                stack.pop()
+            return values[root]
+        self.compiled = compiled
+
+    def visit_union(self, union: Union):
+        h = self.compile(union.h)
+        sets = self.sets
+        self.compiled = lambda p: sets.union(*[h((u, *p[1:])) for u in sets.elements(p[0])])
+
+    def visit_merge(self, merge: Merge):
+        union = self.sets.union
+        self.compiled = lambda p: union(*p)
+
+
+class CompiledProgram:
+    """
+    A program compiled once, that evaluates to the same values as with the
+    Interpreter, much faster.
+    """
+
+    def __init__(self, node: Node, arena: Optional[SetArena] = None):
+        self.root = node
+        self.sets = SetOperations() if arena is None else arena
+        compiler = Compiler(self.sets)
+        self.function = compiler.compile(node)
+        self.memos = compiler.memos
+
+    def clear_cache(self):
+        for memo in self.memos:
+            memo.clear()
+
+    def interpret(self, *args: Argument) -> Any:
+        if len(args) != self.root.arity:
+            raise MismatchedNumberOfArguments(self.root.arity, len(args))
+        return self.function(tuple(parse_arguments(self.sets, *args)))
+
+    def evaluate(self, *values: Any) -> Any:
+        """Like interpret, with arguments that are already values."""
+        if len(values) != self.root.arity:
+            raise MismatchedNumberOfArguments(self.root.arity, len(values))
+        return self.function(values)
+
+    def __str__(self):
+        return f'CompiledProgram({self.root})'
+
+    __repr__ = __str__
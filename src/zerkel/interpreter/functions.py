@@ -1,4 +1,6 @@
 
+from typing import Callable, Dict
+
 from zerkel.core.node import *
 from zerkel.core.set import Set
 from zerkel.interpreter import parse
@@ -6,7 +8,7 @@ from zerkel.interpreter import parse
 
 def constante(value):
     def callback(stack, expression, parameters):
-        expression.assign_value(value)
+        expression.assign_value(expression.interpreter.sets.from_set(value))
     return callback
 
 
@@ -22,15 +24,18 @@ def r_ite(stack, expression, parameters):
     else:
         if not v.is_closed:
             stack.push(v)
-        elif v.value.contains(u.value):
-            expression.assign_value(Set())
+        elif expression.interpreter.sets.contains(v.value, u.value):
+            expression.assign_value(expression.interpreter.sets.empty())
         elif not x.is_closed:
             stack.push(x)
         else:
             expression.assign_value(x.value)
 
 
-def compile_functions():
-    Function(parse('R?'), r_ite)
-    Function(parse('R>I'), constante(Set()))
-    Function(parse('RR?'), constante(Set()))
+def compile_functions() -> Dict[Node, Callable]:
+    """Intrinsics to give to an Interpreter, by the node they replace."""
+    return {
+        parse('R?'): r_ite,
+        parse('R>I'): constante(Set()),
+        parse('RR?'): constante(Set()),
+    }
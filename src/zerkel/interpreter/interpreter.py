@@ -1,15 +1,19 @@
-from typing import (List, Optional, Union as _Union, 
+from typing import (List, Optional, Union as _Union, Callable,
                     Deque, Sequence, Tuple, Dict, Any, Hashable)
 
+import time
 from collections import deque
 
 from tabulate import tabulate
 
 from zerkel.core import (
-    Node, Set, Visitable, NodeVisitor, EmptySet, Identity, 
+    Node, Set, SetArena, Visitable, NodeVisitor, EmptySet, Identity, 
     UnionPlus, IfThenElse, In, Projection, Composition, 
     Recursion, Union, Merge, Function
 )
+from zerkel.interpreter.semantic_analyzer import StrictArguments
+from zerkel.interpreter.memo import MEMOIZED, ResultMemo, resolve_memo
+from zerkel.interpreter.budget import Budget, BudgetExceeded
 
 
 Argument = _Union[int, str, Set]
@@ -65,6 +69,11 @@ class LazyExpression(Expression):
             instance = Expression.__new__(cls)
             interpreter.cache[key] = instance
             instance.is_closed = False
+            # Key of the value in the memo of the interpreter, False when
+            # it is not to be memoized.
+            instance.memo_key = None
+            # The node it was built with, node changes while evaluating.
+            instance.origin = node
             return instance
 
     def __init__(self, interpreter: 'Interpreter', node: Node,
@@ -75,7 +84,12 @@ class LazyExpression(Expression):
 
     def evaluate(self) -> None:
         if not self.is_closed:
-            Evaluator(self).evaluate()
+            self.interpreter.evaluator(self).evaluate()
+
+    def assign_value(self, value: Set) -> None:
+        super().assign_value(value)
+        if self.memo_key:
+            self.interpreter.memo.put(self.memo_key, value)
 
     def change_node(self, node: Node, parameters: Expressions) -> None:
         self.node = node
@@ -127,6 +141,9 @@ class Observer:
     def notify(self):
         pass
 
+    def done(self):
+        pass
+
 
 class StepCounter(Observer):
     def init(self):
@@ -136,13 +153,17 @@ class StepCounter(Observer):
         self.steps += 1
         
 
+# Nodes whose evaluation is an atomic step, see AtomicStepCounter.
+ATOMIC = (EmptySet, UnionPlus, IfThenElse)
+
+
 class AtomicStepCounter(Observer):
     def init(self):
         self.steps = 0
 
     def notify(self):
         peek = self.interpreter.stack.peek()
-        if not peek.is_closed and isinstance(peek.node, (EmptySet, UnionPlus, IfThenElse)): 
+        if not peek.is_closed and isinstance(peek.node, ATOMIC): 
             self.steps += 1
 
 class Debugger(StepCounter):
@@ -157,6 +178,38 @@ class StepByStep(Debugger):
         input('Press enter to continue')
 
 
+class SetOperations:
+    """
+    Operations the interpreter performs on values, here on Set objects.
+    A SetArena provides the same operations on integer ids.
+    """
+    empty = Set
+    adjoin = staticmethod(Set.adjoin)
+    contains = staticmethod(Set.contains)
+    union = staticmethod(Set.union)
+    elements = staticmethod(iter)
+    generate_ordinal = staticmethod(Set.generate_ordinal)
+
+    @staticmethod
+    def from_set(s: Set) -> Set:
+        return s
+
+    to_set = from_set
+
+
+def parse_arguments(sets, *args: Argument) -> List[Any]:
+    """Values of the arguments given as Sets, strings or ordinals."""
+    values: List[Any] = []
+    for arg in args:
+        if isinstance(arg, Set):
+            values.append(sets.from_set(arg))
+        elif isinstance(arg, str):
+            values.append(sets.from_set(Set.parse(arg)))
+        elif isinstance(arg, int):
+            values.append(sets.generate_ordinal(arg))
+    return values
+
+
 class MismatchedNumberOfArguments(Exception):
     def __init__(self, expected: int, actual: int):
         self.expected = expected
@@ -167,13 +220,32 @@ class MismatchedNumberOfArguments(Exception):
 
 
 class Interpreter:
-    __slots__ = ['root', 'stack', 'observers', 'cache']
-
-    def __init__(self, node: Node):
+    __slots__ = ['root', 'stack', 'observers', 'cache', 'sets', 'intrinsics',
+                 'strategy', 'evaluator', 'strict_arguments', 'memo', 'budget']
+
+    def __init__(self, node: Node, arena: Optional[SetArena] = None,
+                 intrinsics: Optional[Dict[Node, Callable]] = None,
+                 strategy: str = 'lazy',
+                 memo: _Union[bool, ResultMemo, None] = None,
+                 budget: Optional[Budget] = None):
         self.root = node
         self.stack: Stack
         self.observers: List[Observer] = []
         self.cache: Dict[Hashable, Expression] = {}
+        self.sets = SetOperations() if arena is None else arena
+        # Callbacks evaluating some nodes instead of their definition, see
+        # compile_functions.
+        self.intrinsics = intrinsics or {}
+        if strategy not in STRATEGIES:
+            raise ValueError(f'Unknown strategy {strategy!r}')
+        self.strategy = strategy
+        self.evaluator = STRATEGIES[strategy]
+        self.strict_arguments = StrictArguments()
+        # Values shared with other interpreters, memo=True is the shared
+        # memo of the process. Arena ids are only valid in their arena.
+        self.memo = resolve_memo(memo) if arena is None else None
+        # Limits of every run, unless interpret or evaluate are given one.
+        self.budget = budget
     
     def add_observer(self, observer: Observer) -> None:
         observer.setup(self)
@@ -182,41 +254,96 @@ class Interpreter:
     def clear_cache(self):
         self.cache.clear()
 
-    def interpret(self, *args: Argument) -> Set:
+    def interpret(self, *args: Argument, budget: Optional[Budget] = None) -> Any:
         if len(args) != self.root.arity:
             raise MismatchedNumberOfArguments(self.root.arity, len(args))
         self.stack = Stack()
         self.stack.push(self._build_root_expression(*args))
-        return self.run()
-
-    def run(self):
+        return self.run(budget)
+
+    def evaluate(self, *values: Any, budget: Optional[Budget] = None) -> Any:
+        """Like interpret, with arguments that are already values: Sets or
+        ids of the arena."""
+        if len(values) != self.root.arity:
+            raise MismatchedNumberOfArguments(self.root.arity, len(values))
+        parameters = tuple(ClosedExpression(v, self) for v in values)
+        self.stack = Stack()
+        self.stack.push(LazyExpression(self, self.root, parameters))
+        return self.run(budget)
+
+    def run(self, budget: Optional[Budget] = None):
+        """Evaluates the stack, raises BudgetExceeded when the budget, or
+        the budget of the interpreter, runs out."""
+        if budget is None:
+            budget = self.budget
         for observer in self.observers:
             observer.init()
+        try:
+            if budget is None:
+                while not self.stack.head().is_closed:
+                    for observer in self.observers:
+                        observer.notify()
+                    if self.stack.peek().is_closed:
+                        self.stack.pop()
+                    else:
+                        self.stack.peek().evaluate()
+            else:
+                self._run_budgeted(budget)
+        finally:
+            for observer in self.observers:
+                observer.done()
+        return self.stack.head().value
+
+    def _run_budgeted(self, budget: Budget) -> None:
+        # A single comparison per step, the budget is only looked at when
+        # the step count reaches the next check.
+        start, sets = time.perf_counter(), self.created_sets()
+        steps = 0
+        check = budget.every if budget.steps is None else min(budget.every, budget.steps)
         while not self.stack.head().is_closed:
+            if steps == check:
+                check = self._check_budget(budget, steps, start, sets)
             for observer in self.observers:
                 observer.notify()
             if self.stack.peek().is_closed:
                 self.stack.pop()
             else:
                 self.stack.peek().evaluate()
-        return self.stack.head().value
+            steps += 1
+
+    def _check_budget(self, budget: Budget, steps: int, start: float, sets: int) -> int:
+        seconds = time.perf_counter() - start
+        sets = self.created_sets() - sets
+        exceeded = None
+        if budget.steps is not None and steps >= budget.steps:
+            exceeded = 'steps', budget.steps
+        elif budget.seconds is not None and seconds > budget.seconds:
+            exceeded = 'seconds', budget.seconds
+        elif budget.sets is not None and sets > budget.sets:
+            exceeded = 'sets', budget.sets
+        if exceeded is not None:
+            raise BudgetExceeded(*exceeded, steps, seconds, sets, len(self.stack.stack))
+        if budget.steps is None:
+            return steps + budget.every
+        return min(steps + budget.every, budget.steps)
+
+    def created_sets(self) -> int:
+        """Number of sets created so far, by the process or in the arena."""
+        if isinstance(self.sets, SetOperations):
+            return Set.cache.misses
+        return self.sets.size
 
     def _build_root_expression(self, *args: Argument) -> Expression:
         parameters = self._parse_arguments(*args)
         return LazyExpression(self, self.root, parameters)
     
     def _parse_arguments(self, *args: Argument) -> Expressions:
-        parameters: List[Expression] = []
-        for arg in args:
-            if isinstance(arg, Set):
-                parameters.append(ClosedExpression(arg, self))
-            elif isinstance(arg, str):
-                parameters.append(ClosedExpression(Set.parse(arg), self))
-            elif isinstance(arg, int):
-                parameters.append(ClosedExpression(Set.generate_ordinal(arg), self))
-        return tuple(parameters)
+        values = parse_arguments(self.sets, *args)
+        return tuple(ClosedExpression(value, self) for value in values)
 
     def __str__(self):
+        if self.strategy != 'lazy':
+            return f'Interpreter({self.root}, strategy={self.strategy!r})'
         return f'Interpreter({self.root})'
     
     __repr__ = __str__
@@ -239,13 +366,38 @@ class Evaluator(NodeVisitor):
         return self.interpreter.stack
     
     def evaluate(self) -> None:
-        self.lazy_expression.node.accept(self)
+        node = self.lazy_expression.node
+        if self.interpreter.memo is not None and self.lazy_expression.memo_key is None:
+            if self._recall():
+                return
+        intrinsics = self.interpreter.intrinsics
+        if intrinsics and node in intrinsics:
+            intrinsics[node](self.stack, self.lazy_expression, self.parameters)
+        else:
+            node.accept(self)
+
+    def _recall(self) -> bool:
+        # Looks the expression up in the memo the first time it is
+        # evaluated, its key is kept to memoize its value otherwise.
+        expression = self.lazy_expression
+        expression.memo_key = False
+        if not isinstance(expression.node, MEMOIZED):
+            return False
+        if not all(p.is_closed for p in expression.parameters):
+            return False
+        key = (expression.node, *(p.value for p in expression.parameters))
+        value = self.interpreter.memo.get(key)
+        if value is None:
+            expression.memo_key = key
+            return False
+        expression.assign_value(value)
+        return True
 
     def visit_function(self, function: Function) -> None:
         function.call(self.stack, self.lazy_expression, self.parameters)
 
     def visit_empty_set(self, empty_set: EmptySet) -> None:
-        self.lazy_expression.assign_value(Set())
+        self.lazy_expression.assign_value(self.interpreter.sets.empty())
 
     def visit_identity(self, identity: Identity) -> None:
         x, *_ = self.parameters
@@ -262,7 +414,8 @@ class Evaluator(NodeVisitor):
             if not y.is_closed:
                 self.stack.push(y)
             else:
-                self.lazy_expression.assign_value(Set(*x.value, y.value))
+                sets = self.interpreter.sets
+                self.lazy_expression.assign_value(sets.adjoin(x.value, y.value))
 
     def visit_if_then_else(self, if_then_else: IfThenElse) -> None:
         x, y, u, v = self.parameters
@@ -281,7 +434,7 @@ class Evaluator(NodeVisitor):
         else:
             if not v.is_closed:
                 self.stack.push(v)
-            elif v.value.contains(u.value):
+            elif self.interpreter.sets.contains(v.value, u.value):
                 if not x.is_closed:
                     self.stack.push(x)
                 else:
@@ -297,12 +450,12 @@ class Evaluator(NodeVisitor):
             self.lazy_expression.change_node(in_operator.f, self.parameters)
         elif u == v:
             self.lazy_expression.change_node(in_operator.g, self.parameters)
-        if not u.is_closed:
+        elif not u.is_closed:
             self.stack.push(u)
         else:
             if not v.is_closed:
                 self.stack.push(v)
-            elif v.value.contains(u.value):
+            elif self.interpreter.sets.contains(v.value, u.value):
                 self.lazy_expression.change_node(in_operator.f, self.parameters)
             else:
                 self.lazy_expression.change_node(in_operator.g, self.parameters)
@@ -332,7 +485,8 @@ class Evaluator(NodeVisitor):
         else:
             le, ce = LazyExpression, ClosedExpression
             i = self.interpreter
-            p = tuple(le(i, union.h, (ce(u, i), *x)) for u in z.value)
+            p = tuple(le(i, union.h, (ce(u, i), *x))
+                      for u in i.sets.elements(z.value))
             self.lazy_expression.change_node(Merge(), p)
 
     def visit_merge(self, merge: Merge):
@@ -341,5 +495,120 @@ class Evaluator(NodeVisitor):
             if not p.is_closed:
                 self.stack.push(p)
                 return
-            result.extend(p.value)
-        self.stack.peek().assign_value(Set(*result))
+            result.append(p.value)
+        self.stack.peek().assign_value(self.interpreter.sets.union(*result))
+
+
+class StrictEvaluator(Evaluator):
+    """
+    Evaluates the compounds of a composition, and the union of the
+    recursive calls of a recursion, as soon as they are built when they are
+    always needed, all at once instead of one at a time. Compounds
+    selecting an argument or the empty set are not built at all. Only the
+    arguments that may be skipped by In and IfThenElse stay lazy.
+    """
+
+    def _compound(self, g: Node, parameters: Expressions) -> Expression:
+        i = self.interpreter
+        if isinstance(g, Identity):
+            return parameters[0]
+        if isinstance(g, Projection):
+            if isinstance(g.f, Identity):
+                return parameters[g.left]
+            if isinstance(g.f, EmptySet):
+                return ClosedExpression(i.sets.empty(), i)
+        return LazyExpression(i, g, parameters)
+
+    def _push(self, expressions: Expressions) -> None:
+        for e in reversed(expressions):
+            if not e.is_closed:
+                self.stack.push(e)
+
+    def visit_composition(self, o: Composition):
+        p = self.parameters
+        parameters = tuple(self._compound(g, p) for g in o.g)
+        self.lazy_expression.change_node(o.f, parameters)
+        strict = self.interpreter.strict_arguments.of(o.f)
+        if isinstance(o.f, IfThenElse):
+            x, y, u, v = parameters
+            if x != y and u != v:
+                strict = frozenset((2, 3))
+        self._push([e for i, e in enumerate(parameters) if i in strict])
+
+    def visit_recursion(self, r: Recursion):
+        super().visit_recursion(r)
+        if 0 in self.interpreter.strict_arguments.of(r.g):
+            self._push(self.parameters[:1])
+
+    def visit_union(self, union: Union):
+        super().visit_union(union)
+        if isinstance(self.lazy_expression.node, Merge):
+            self._push(self.parameters)
+
+
+class BottomUpEvaluator(Evaluator):
+    """
+    Evaluates a recursion whose body always needs its recursive argument
+    bottom-up: the calls on the transitive closure of the argument are
+    pushed at once, the elements before the sets containing them, so a call
+    only runs once the calls on its elements are closed and their union is
+    computed directly, without Union and Merge expressions. Shared subsets
+    are computed once, the calls being cached. The recursions whose body
+    may skip its recursive argument are evaluated lazily.
+    """
+
+    def visit_recursion(self, r: Recursion):
+        if 0 not in self.interpreter.strict_arguments.of(r.g):
+            super().visit_recursion(r)
+            return
+        z, *x = self.parameters
+        if not z.is_closed:
+            self.stack.push(z)
+            return
+        i = self.interpreter
+        values = []
+        for u in i.sets.elements(z.value):
+            value = self._value(r, u, x)
+            if value is None:
+                for c in reversed(self._pending(r, z.value, x)):
+                    self.stack.push(c)
+                return
+            values.append(value)
+        union = ClosedExpression(i.sets.union(*values), i)
+        self.lazy_expression.change_node(r.g, (union, z, *x))
+
+    def _value(self, r: Recursion, u: Any, x: Expressions) -> Any:
+        # Value of the call on u if it is known, looked up without building
+        # the call.
+        cache = self.interpreter.cache
+        c = cache.get(u)
+        if c is not None:
+            c = cache.get((r, (c, *x)))
+            if c is not None and c.is_closed:
+                return c.value
+        return None
+
+    def _pending(self, r: Recursion, z: Any, x: Expressions) -> List[Expression]:
+        # Calls left to evaluate on the transitive closure of z, in
+        # post-order of a depth first search.
+        i = self.interpreter
+        elements = i.sets.elements
+        order: List[Expression] = []
+        seen = {z}
+        stack = [(z, None, iter(elements(z)))]
+        while stack:
+            s, call, it = stack[-1]
+            for u in it:
+                if u not in seen:
+                    seen.add(u)
+                    if self._value(r, u, x) is None:
+                        c = LazyExpression(i, r, (ClosedExpression(u, i), *x))
+                        stack.append((u, c, iter(elements(u))))
+                        break
+            else:
+                stack.pop()
+                if call is not None:
+                    order.append(call)
+        return order
+
+STRATEGIES = {'lazy': Evaluator, 'strict': StrictEvaluator, 'bottom_up': BottomUpEvaluator}
@@ -1,13 +1,20 @@
 import sys
 
-from typing import List, Iterable, Union as _Union
+from typing import List, Iterable, Optional, Tuple, Union as _Union
 
 from zerkel.core.node import Node
+from zerkel.core.arena import SetArena
 from zerkel.interpreter.interpreter import (
     Interpreter, Argument, StepCounter, Debugger, StepByStep
 )
 from zerkel.interpreter.parser import Parser, ParseException
 from zerkel.interpreter.semantic_analyzer import SemanticAnalyzer
+from zerkel.interpreter.compiler import CompiledProgram
+from zerkel.interpreter.vm import VirtualMachine
+from zerkel.interpreter.memo import ResultMemo
+from zerkel.interpreter.budget import Budget
+from zerkel.interpreter.profiler import SamplingProfiler
+from zerkel.interpreter.attribution import CostAttribution
 from zerkel.interpreter.table import Table
 from zerkel.interpreter.benchmark import Benchmark, Compare
 
@@ -25,11 +32,34 @@ def check(node: _Node):
     return SemanticAnalyzer(node).check()
 
 
-def interpret(node: _Node, *args: Argument):
+def compile_program(node: _Node, arena: Optional[SetArena] = None) -> CompiledProgram:
     if isinstance(node, str):
         node = parse(node)
     check(node)
-    return Interpreter(node).interpret(*args)
+    return CompiledProgram(node, arena)
+
+
+def interpret(node: _Node, *args: Argument, intrinsics=None, engine: str = 'interpreter',
+              strategy: str = 'lazy', memo: _Union[bool, ResultMemo, None] = None,
+              budget: Optional[Budget] = None):
+    """Evaluates the program with the reference interpreter or, with
+    engine='compiled' or 'vm', compiled into closures or lowered to
+    bytecode, intrinsics are then unused. memo is the ResultMemo of the
+    interpreter, True for the one shared by the process. A budget, only
+    checked by the interpreter, raises BudgetExceeded when it runs out."""
+    if isinstance(node, str):
+        node = parse(node)
+    check(node)
+    if budget is not None and engine != 'interpreter':
+        raise ValueError(f'Budgets are not checked by the {engine!r} engine')
+    if engine == 'compiled':
+        return CompiledProgram(node).interpret(*args)
+    if engine == 'vm':
+        return VirtualMachine.from_node(node).interpret(*args)
+    if engine != 'interpreter':
+        raise ValueError(f'Unknown engine {engine!r}')
+    interpreter = Interpreter(node, intrinsics=intrinsics, strategy=strategy, memo=memo)
+    return interpreter.interpret(*args, budget=budget)
 
 
 def debug(node: _Node, *args: Argument):
@@ -41,6 +71,29 @@ def debug(node: _Node, *args: Argument):
     return i.interpret(*args)
 
 
+def profile(node: _Node, *args: Argument, every: int = 1000,
+            interval: Optional[float] = None, strategy: str = 'lazy') -> SamplingProfiler:
+    if isinstance(node, str):
+        node = parse(node)
+    check(node)
+    i = Interpreter(node, strategy=strategy)
+    profiler = SamplingProfiler(every, interval)
+    i.add_observer(profiler)
+    i.interpret(*args)
+    return profiler
+
+
+def attribute(node: _Node, *args: Argument, strategy: str = 'lazy') -> CostAttribution:
+    if isinstance(node, str):
+        node = parse(node)
+    check(node)
+    i = Interpreter(node, strategy=strategy)
+    attribution = CostAttribution()
+    i.add_observer(attribution)
+    i.interpret(*args)
+    return attribution
+
+
 def step_by_step(node: _Node, *args: Argument):
     if isinstance(node, str):
         node = parse(node)
@@ -49,26 +102,34 @@ def step_by_step(node: _Node, *args: Argument):
     i.add_observer(StepByStep())
     return i.interpret(*args)
 
-def table(node: _Node, *args: Iterable[Argument], repeat=None) -> Table:
+def table(node: _Node, *args: Iterable[Argument], repeat=None,
+          arena: Optional[SetArena] = None,
+          memo: _Union[bool, ResultMemo, None] = None,
+          budget: Optional[Budget] = None) -> Table:
     if isinstance(node, str):
         node = parse(node)
     if repeat is not None and repeat > 0:
         args = tuple(map(tuple, args))
         args = tuple(tuple(arg) for _ in range(repeat) for arg in args)
-    return Table(node, *args)
+    return Table(node, *args, arena=arena, memo=memo, budget=budget)
 
 
-def benchmark(node: _Node, *args: Iterable[Argument], repeat: int=None, iterations: int=1) -> Benchmark:
+def benchmark(node: _Node, *args: Iterable[Argument], repeat: int=None, iterations: int=1,
+              strategy: str = 'lazy',
+              memo: _Union[bool, ResultMemo, None] = None,
+              budget: Optional[Budget] = None) -> Benchmark:
     if isinstance(node, str):
         node = parse(node)
     if repeat is not None and repeat > 0:
         
         args = tuple(map(tuple, args))
         args = tuple(tuple(arg) for _ in range(repeat) for arg in args)
-    return Benchmark(node, iterations, *args)
+    return Benchmark(node, iterations, *args, strategy=strategy, memo=memo,
+                     budget=budget)
 
 
-def compare(node1: _Node, node2: _Node, *args: Iterable[Argument], repeat: int=None, iterations: int=1) -> Compare:
+def compare(node1: _Node, node2: _Node, *args: Iterable[Argument], repeat: int=None, iterations: int=1,
+            strategies: Tuple[str, str] = ('lazy', 'lazy')) -> Compare:
     if isinstance(node1, str):
         node1 = parse(node1)
     if isinstance(node2, str):
@@ -76,4 +137,4 @@ def compare(node1: _Node, node2: _Node, *args: Iterable[Argument], repeat: int=N
     if repeat is not None and repeat > 0:
         args = tuple(map(tuple, args))
         args = tuple(tuple(arg) for _ in range(repeat) for arg in args)
-    return Compare(node1, node2, iterations, *args)
+    return Compare(node1, node2, iterations, *args, strategies=strategies)
@@ -0,0 +1,62 @@
+import threading
+from typing import Any, Hashable, Optional, Union as _Union
+
+from zerkel.core import LRUCache, CacheStats, In, Composition, Recursion, Union, Function
+
+
+# Nodes worth memoizing, the others are a step or two away from a value.
+MEMOIZED = (In, Composition, Recursion, Union, Function)
+
+
+class ResultMemo(LRUCache):
+    """
+    Values of programs on closed Set arguments, keyed by the node and the
+    arguments. Nodes and sets are interned, so a value is valid for every
+    interpreter and every program containing the node, the memo can be
+    shared by all of them. The least recently used values are evicted
+    beyond maxsize.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 1 << 16):
+        super().__init__(maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return super().get(key, default)
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        with self._lock:
+            return super().put(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            super().clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def copy(self) -> 'ResultMemo':
+        """A memo holding the same values, with counters of its own."""
+        memo = ResultMemo(self.maxsize)
+        with self._lock:
+            memo._data.update(self._data)
+        return memo
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+_shared = ResultMemo()
+
+
+def shared_memo() -> ResultMemo:
+    """The process-wide memo used when memo=True is given."""
+    return _shared
+
+
+def resolve_memo(memo: _Union[bool, ResultMemo, None]) -> Optional[ResultMemo]:
+    if memo is True:
+        return _shared
+    if memo is None or memo is False:
+        return None
+    return memo
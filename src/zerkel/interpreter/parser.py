@@ -1,3 +1,6 @@
+import weakref
+from typing import Optional
+
 import pyparsing as pp
 from zerkel.core import (
     Node, EmptySet, Identity, UnionPlus, IfThenElse, In,
@@ -5,6 +8,15 @@ from zerkel.core import (
 )
 
 
+# Name of the outermost macro a node was parsed from, for as long as the
+# node lives.
+macros: 'weakref.WeakKeyDictionary[Node, str]' = weakref.WeakKeyDictionary()
+
+
+def macro_name(node: Node) -> Optional[str]:
+    return macros.get(node)
+
+
 class ParseException(Exception):
     def __init__(self, text, col):
         self.text = text
@@ -78,10 +90,10 @@ class Parser:
         _or.addParseAction(self._generic_builder('o?<1<E<1I'))
         
         _all = pp.Keyword('all').suppress() + self._expression
-        _all.addParseAction(self._all)
+        _all.addParseAction(self._named('all', self._all))
         
         _any = pp.Keyword('any').suppress() + self._expression
-        _any.addParseAction(self._any)     
+        _any.addParseAction(self._named('any', self._any))     
            
         _in = pp.Keyword('in')
         _in.addParseAction(self._generic_builder('o?<<1<<E>I<I'))
@@ -168,16 +180,16 @@ class Parser:
         select = none | select
 
         map = pp.Keyword('map').suppress() + self._expression
-        map.addParseAction(self._build_map)
+        map.addParseAction(self._named('map', self._build_map))
 
         filter = pp.Keyword('filter').suppress() + self._expression
-        filter.addParseAction(self._build_filter)
+        filter.addParseAction(self._named('filter', self._build_filter))
 
         op = pp.Keyword('op').suppress() + self._expression + self._expression
-        op.addParseAction(self._build_op)
+        op.addParseAction(self._named('op', self._build_op))
 
         iop = pp.Keyword('iop').suppress() + self._expression
-        iop.addParseAction(self._build_iop)
+        iop.addParseAction(self._named('iop', self._build_iop))
 
         add = pp.Keyword('add')
         add.addParseAction(self._generic_builder('op successor << singleton'))
@@ -254,8 +266,18 @@ class Parser:
         return Recursion(tokens[0])
 
     def _generic_builder(self, code):
-        def builder():
-            return self.parse(code)
+        def builder(tokens):
+            node = self.parse(code)
+            macros[node] = tokens[0]
+            return node
+        return builder
+
+    @staticmethod
+    def _named(name, build):
+        def builder(tokens):
+            node = build(tokens)
+            macros[node] = name
+            return node
         return builder
 
     def _build_select(self, tokens):
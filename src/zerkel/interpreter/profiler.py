@@ -0,0 +1,131 @@
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from tabulate import tabulate
+
+from zerkel.core import Node
+from zerkel.interpreter.interpreter import Observer
+from zerkel.interpreter.parser import macro_name
+
+
+def node_label(node: Node, n: int = 24) -> str:
+    name = macro_name(node)
+    if name is not None:
+        return name
+    program = str(node)
+    if len(program) > n:
+        program = program[:n - 3] + '...'
+    return program
+
+
+class SamplingProfiler(Observer):
+    """
+    Samples the stack of the Interpreter every ``every`` steps or, given an
+    interval, every ``interval`` seconds from a timer thread. A sample
+    records the node on top of the stack, the innermost macro on the stack
+    and every macro on the stack, so the report ranks the nodes and the
+    macros by the share of samples they were running in. Samples add up
+    over the runs until clear is called.
+    """
+
+    def __init__(self, every: int = 1000, interval: Optional[float] = None):
+        self.every = every
+        self.interval = interval
+        self._countdown = every
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.clear()
+
+    def clear(self):
+        self.samples = 0
+        self.depth = 0
+        self.nodes: Counter = Counter()
+        self.kinds: Counter = Counter()
+        self.macros: Counter = Counter()
+        self.macros_total: Counter = Counter()
+
+    def init(self):
+        self._countdown = self.every
+        if self.interval is not None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._sample_periodically, daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        if self.interval is None:
+            self._countdown -= 1
+            if self._countdown <= 0:
+                self._countdown = self.every
+                self.sample()
+
+    def done(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _sample_periodically(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        try:
+            expressions = list(self.interpreter.stack)
+        except (AttributeError, RuntimeError):
+            # No run yet, or the stack changed while being copied.
+            return
+        expressions = [e for e in expressions if not e.is_closed]
+        if not expressions:
+            return
+        self.samples += 1
+        self.depth += len(expressions)
+        self.nodes[expressions[-1].node] += 1
+        innermost = None
+        found = set()
+        for e in reversed(expressions):
+            self.kinds[type(e.node).__name__] += 1
+            for node in (e.node, e.origin):
+                name = macro_name(node)
+                if name is not None:
+                    if innermost is None:
+                        innermost = name
+                    found.add(name)
+        self.macros[innermost or '<none>'] += 1
+        self.macros_total.update(found)
+
+    def by_node(self) -> List[Tuple[str, int, float]]:
+        return [(node_label(node), n, n / self.samples)
+                for node, n in self.nodes.most_common()]
+
+    def by_macro(self) -> List[Tuple[str, int, float, float]]:
+        # Ranked by self samples, then by total samples for the macros that
+        # only call others.
+        rows = [(name, self.macros[name], self.macros[name] / self.samples,
+                 self.macros_total[name] / self.samples)
+                for name in set(self.macros) | set(self.macros_total)]
+        return sorted(rows, key=lambda row: (row[1], row[3]), reverse=True)
+
+    def report(self, limit: int = 15, format="fancy_grid") -> str:
+        if not self.samples:
+            return 'No samples'
+        lines = [f'{self.samples} samples, mean stack depth '
+                 f'{self.depth / self.samples:.1f}']
+        lines.append(tabulate(
+            [(label, n, f'{share:.1%}') for label, n, share in self.by_node()[:limit]],
+            ['node', 'samples', 'self'], tablefmt=format
+        ))
+        lines.append(tabulate(
+            [(name, n, f'{share:.1%}', f'{total:.1%}')
+             for name, n, share, total in self.by_macro()[:limit]],
+            ['macro', 'samples', 'self', 'total'], tablefmt=format
+        ))
+        depth = self.depth
+        lines.append(tabulate(
+            [(kind, f'{n / depth:.1%}') for kind, n in self.kinds.most_common(limit)],
+            ['stack', 'share'], tablefmt=format
+        ))
+        return '\n'.join(lines)
+
+    def __str__(self) -> str:
+        return self.report()
@@ -1,5 +1,8 @@
+from typing import Dict, FrozenSet
+
 from zerkel.core import (
-    Node, NodeVisitor, In, Projection, Composition, Recursion
+    Node, NodeVisitor, EmptySet, Identity, UnionPlus, IfThenElse, In,
+    Projection, Composition, Recursion, Union, Merge, Function
 )
 
 
@@ -109,3 +112,98 @@ class SemanticAnalyzer(NodeVisitor):
         if r.g.arity < 2:
             raise InvalidRecursionArity(r)
         r.g.accept(self)
+
+
+class UsedArguments(NodeVisitor):
+    """
+    Positions of the arguments a program may evaluate. The value of a
+    program does not depend on the other arguments, they need not be
+    computed.
+    """
+
+    def __init__(self):
+        self.cache: Dict[Node, FrozenSet[int]] = {}
+        self.used: FrozenSet[int] = frozenset()
+
+    def of(self, node: Node) -> FrozenSet[int]:
+        used = self.cache.get(node)
+        if used is None:
+            node.accept(self)
+            used = self.cache[node] = self.used
+        return used
+
+    def visit_function(self, function: Function):
+        self.used = self.of(function.node)
+
+    def visit_empty_set(self, empty_set: EmptySet):
+        self.used = frozenset()
+
+    def visit_identity(self, identity: Identity):
+        self.used = frozenset((0,))
+
+    def visit_union_plus(self, union_plus: UnionPlus):
+        self.used = frozenset((0, 1))
+
+    def visit_if_then_else(self, if_then_else: IfThenElse):
+        self.used = frozenset(range(4))
+
+    def visit_in(self, in_operator: In):
+        n = in_operator.arity
+        self.used = self.of(in_operator.f) | self.of(in_operator.g) | {n - 2, n - 1}
+
+    def visit_projection(self, projection: Projection):
+        self.used = frozenset(i + projection.left for i in self.of(projection.f))
+
+    def visit_composition(self, composition: Composition):
+        used = self.of(composition.f)
+        self.used = frozenset().union(*(self.of(g) for i, g in enumerate(composition.g)
+                                        if i in used))
+
+    def visit_recursion(self, recursion: Recursion):
+        # The union of the recursive calls only reads the elements of the
+        # first argument and the arguments used by the recursion itself.
+        used = self.of(recursion.g)
+        self.used = frozenset(i - 1 for i in used if i > 0) | ({0} & used)
+
+    def visit_union(self, union: Union):
+        self.used = self.of(union.h)
+
+    def visit_merge(self, merge: Merge):
+        self.used = frozenset()
+
+
+class StrictArguments(UsedArguments):
+    """Positions of the arguments a program always evaluates."""
+
+    def visit_if_then_else(self, if_then_else: IfThenElse):
+        # u and v are skipped when x and y, or u and v, are the same
+        # expression, which is only known while evaluating.
+        self.used = frozenset()
+
+    def visit_composition(self, composition: Composition):
+        if isinstance(composition.f, IfThenElse):
+            x, y, u, v = composition.g
+            if x is not y and u is not v:
+                # Expressions built from different compounds are different.
+                self.used = self.of(u) | self.of(v) | self.of(x) & self.of(y)
+                return
+        super().visit_composition(composition)
+
+    def visit_in(self, in_operator: In):
+        n = in_operator.arity
+        if in_operator.f is in_operator.g:
+            # The Evaluator goes on with f without evaluating u and v.
+            self.used = self.of(in_operator.f)
+        else:
+            self.used = self.of(in_operator.f) & self.of(in_operator.g) | {n - 2, n - 1}
+
+    def visit_union(self, union: Union):
+        self.used = frozenset((0,))
+
+
+def used_arguments(node: Node) -> FrozenSet[int]:
+    return UsedArguments().of(node)
+
+
+def strict_arguments(node: Node) -> FrozenSet[int]:
+    return StrictArguments().of(node)
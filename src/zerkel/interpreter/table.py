@@ -1,4 +1,4 @@
-from typing import List, Iterable, Sequence, Any
+from typing import List, Iterable, Sequence, Any, Optional, Union as _Union
 
 from itertools import product
 
@@ -6,22 +6,40 @@ import numpy as np
 from tabulate import tabulate
 
 from zerkel.interpreter.interpreter import Interpreter, Argument
+from zerkel.interpreter.memo import ResultMemo
+from zerkel.interpreter.budget import Budget
 from zerkel.core import (
-    Node, Set, Visitable, NodeVisitor, EmptySet, Identity, 
+    Node, Set, SetArena, Visitable, NodeVisitor, EmptySet, Identity, 
     UnionPlus, IfThenElse, Projection, Composition, 
     Recursion, Union, Merge
 )
 
 
 class Table:
-    def __init__(self, node: Node, *args: Iterable[Argument]):
+    """
+    Results of a program on every combination of the arguments. With an
+    arena the program runs on set ids and the table holds ids. A memo, see
+    ResultMemo, is only used without an arena. A budget limits every
+    evaluation, BudgetExceeded stops the build.
+    """
+
+    def __init__(self, node: Node, *args: Iterable[Argument],
+                 arena: Optional[SetArena] = None,
+                 memo: _Union[bool, ResultMemo, None] = None,
+                 budget: Optional[Budget] = None):
         self.node = node
+        self.arena = arena
+        self.memo = memo
+        self.budget = budget
         self.args: List[List[Set]] = self._parse_arguments(*args)
         self.table: np.ndarray = self.build(*self.args)
     
     def _parse_arguments(self, *args: Iterable[Argument]) -> List[List[Set]]:
         result = []
         for arg in args:
+            if isinstance(arg, str):
+                result.append(Set.parse_many(arg))
+                continue
             t = []
             for e in arg:
                 if isinstance(e, Set):
@@ -34,14 +52,24 @@ class Table:
         return result
     
     def build(self, *args) -> np.ndarray:
-        result: List[Set] = []
-        interpreter = Interpreter(self.node)
+        result: List[Any] = []
+        interpreter = Interpreter(self.node, self.arena, memo=self.memo, budget=self.budget)
+        args = [[interpreter.sets.from_set(s) for s in arg] for arg in args]
         for x in product(*args):
-            result.append(interpreter.interpret(*x))
-        return np.asarray(result).reshape(tuple(len(arg) for arg in self.args))
+            result.append(interpreter.evaluate(*x))
+        shape = tuple(len(arg) for arg in self.args)
+        if self.arena is not None:
+            return np.asarray(result, dtype=np.int64).reshape(shape)
+        return np.asarray(result).reshape(shape)
+
+    def sets(self) -> np.ndarray:
+        if self.arena is None:
+            return self.table
+        sets = [self.arena.to_set(i) for i in self.table.flat]
+        return np.asarray(sets).reshape(self.table.shape)
 
     def format(self, format="fancy_grid") -> str:
-        return self._format(self.args, self.table, format)
+        return self._format(self.args, self.sets(), format)
     
     def _format(self, args, table, f):
         if len(args) == 1:
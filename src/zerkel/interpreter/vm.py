@@ -0,0 +1,501 @@
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from zerkel.core import (
+    Node, SetArena, NodeVisitor, EmptySet, Identity, UnionPlus, IfThenElse,
+    In, Projection, Composition, Recursion, Union, Merge, Function
+)
+from zerkel.core.codec import CodecException, _varint, _read_varint
+from zerkel.interpreter.interpreter import (
+    Argument, Observer, SetOperations, MismatchedNumberOfArguments,
+    parse_arguments
+)
+from zerkel.interpreter.semantic_analyzer import UsedArguments, StrictArguments
+
+
+# Instructions are flat sequences of integers, an opcode followed by its
+# operands, registers and jump targets being indices:
+#   EMPTY d                  d = {}
+#   MOVE d a                 d = a
+#   ADJOIN d a b             d = a ∪ {b}
+#   UNION d a b              d = a ∪ b
+#   BRANCH u v t             jump to t unless u ∈ v
+#   JUMP t
+#   FORCE r                  evaluates r if it holds a Promise
+#   CALL d f n a1 .. an      d = function f of a1 .. an
+#   PROMISE d f n a1 .. an   d = promise of function f of a1 .. an
+#   RECURSE d k n z x1 .. xm recursion k of z, x1 .. xm, memoized
+#   ELEMENTS d a             d = iterator over the elements of a
+#   NEXT d i t               d = next element of i, jump to t at the end
+#   RETURN a
+EMPTY, MOVE, ADJOIN, UNION, BRANCH, JUMP, FORCE = range(7)
+CALL, PROMISE, RECURSE, ELEMENTS, NEXT, RETURN = range(7, 13)
+
+MAGIC = b'ZBC'
+VERSION = 1
+
+
+class Code:
+    """A function: its arity, its number of registers, the first ones
+    holding the arguments, and its instructions."""
+    __slots__ = ['arity', 'size', 'instructions']
+
+    def __init__(self, arity: int, size: int, instructions: List[int]):
+        self.arity = arity
+        self.size = size
+        self.instructions = instructions
+
+
+class Bytecode:
+    """
+    The functions of a program, the first one being the program, and its
+    recursions, as the function of the step and the function of the union
+    of the recursive calls.
+    """
+
+    def __init__(self, codes: List[Code], recursions: List[Tuple[int, int]]):
+        self.codes = codes
+        self.recursions = recursions
+
+    @property
+    def arity(self) -> int:
+        return self.codes[0].arity
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(MAGIC + bytes([VERSION]))
+        _varint(len(self.codes), out)
+        for code in self.codes:
+            _varint(code.arity, out)
+            _varint(code.size, out)
+            _varint(len(code.instructions), out)
+            for i in code.instructions:
+                _varint(i, out)
+        _varint(len(self.recursions), out)
+        for step, union in self.recursions:
+            _varint(step, out)
+            _varint(union, out)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Bytecode':
+        if data[:len(MAGIC) + 1] != MAGIC + bytes([VERSION]):
+            raise CodecException('unknown bytecode format')
+        i = len(MAGIC) + 1
+
+        def read() -> int:
+            nonlocal i
+            n, i = _read_varint(data, i)
+            return n
+
+        codes = []
+        for _ in range(read()):
+            arity, size, length = read(), read(), read()
+            codes.append(Code(arity, size, [read() for _ in range(length)]))
+        recursions = [(read(), read()) for _ in range(read())]
+        if i != len(data):
+            raise CodecException('trailing bytes')
+        return cls(codes, recursions)
+
+
+class Assembler(NodeVisitor):
+    """
+    Lowers a checked program to Bytecode. Every node gets a function for
+    each set of lazy arguments it is called with, leaves and projections
+    are inlined. As in the Interpreter, arguments that are not always
+    needed are passed as Promises and recursive calls are only made when
+    their union is needed.
+    """
+
+    def __init__(self):
+        self.codes: List[Optional[Code]] = []
+        self.functions: Dict[Tuple[Node, FrozenSet[int]], int] = {}
+        self.recursions: List[Tuple[int, int]] = []
+        self.recursion_index: Dict[Node, int] = {}
+        self.used = UsedArguments()
+        self.strict = StrictArguments()
+        self.instructions: List[int] = []
+        self.size = 0
+        self.params: Sequence[int] = ()
+        self.lazy: FrozenSet[int] = frozenset()
+        self.result = 0
+
+    def assemble(self, node: Node) -> Bytecode:
+        self.function(node, frozenset())
+        return Bytecode(self.codes, self.recursions)
+
+    def _code(self, arity: int, body) -> int:
+        fid = len(self.codes)
+        self.codes.append(None)
+        saved = self.instructions, self.size
+        self.instructions, self.size = [], arity
+        body()
+        self.codes[fid] = Code(arity, self.size, self.instructions)
+        self.instructions, self.size = saved
+        return fid
+
+    def function(self, node: Node, lazy: FrozenSet[int]) -> int:
+        key = (node, lazy)
+        if key not in self.functions:
+            def body():
+                result = self.emit(node, range(node.arity), lazy)
+                self._op(RETURN, result)
+            self.functions[key] = self._code(node.arity, body)
+        return self.functions[key]
+
+    def _register(self) -> int:
+        self.size += 1
+        return self.size - 1
+
+    def _op(self, *operands: int) -> int:
+        self.instructions.extend(operands)
+        return len(self.instructions) - 1
+
+    def _read(self, i: int) -> int:
+        r = self.params[i]
+        if i in self.lazy:
+            self._op(FORCE, r)
+        return r
+
+    def emit(self, node: Node, params: Sequence[int], lazy: FrozenSet[int]) -> int:
+        """Emits the body of node inline, returns its result register."""
+        self.params, self.lazy = params, lazy
+        node.accept(self)
+        return self.result
+
+    def apply(self, node: Node, params: Sequence[int], lazy: FrozenSet[int]) -> int:
+        """Emits node inline when it is a leaf or a projection, otherwise a
+        call to its function."""
+        if isinstance(node, (EmptySet, Identity, UnionPlus, IfThenElse, Projection)):
+            return self.emit(node, params, lazy)
+        d = self._register()
+        self._op(CALL, d, self.function(node, lazy), len(params), *params)
+        return d
+
+    def _branch(self, u: int, v: int, then, otherwise) -> int:
+        d = self._register()
+        jump = self._op(BRANCH, u, v, -1)
+        self._op(MOVE, d, then())
+        end = self._op(JUMP, -1)
+        self.instructions[jump] = len(self.instructions)
+        self._op(MOVE, d, otherwise())
+        self.instructions[end] = len(self.instructions)
+        return d
+
+    def visit_function(self, function: Function):
+        # Intrinsics are callbacks of the Interpreter, their definition is
+        # assembled instead.
+        self.result = self.emit(function.node, self.params, self.lazy)
+
+    def visit_empty_set(self, empty_set: EmptySet):
+        self.result = self._register()
+        self._op(EMPTY, self.result)
+
+    def visit_identity(self, identity: Identity):
+        self.result = self._read(0)
+
+    def visit_union_plus(self, union_plus: UnionPlus):
+        x, y = self._read(0), self._read(1)
+        self.result = self._register()
+        self._op(ADJOIN, self.result, x, y)
+
+    def visit_if_then_else(self, if_then_else: IfThenElse):
+        u, v = self._read(2), self._read(3)
+        params, lazy = self.params, self.lazy
+
+        def read(i):
+            self.params, self.lazy = params, lazy
+            return self._read(i)
+        self.result = self._branch(u, v, lambda: read(0), lambda: read(1))
+
+    def visit_in(self, in_operator: In):
+        params, lazy, n = self.params, self.lazy, in_operator.arity
+        if in_operator.f is in_operator.g:
+            self.result = self.apply(in_operator.f, params, lazy)
+            return
+        u, v = self._read(n - 2), self._read(n - 1)
+        self.result = self._branch(
+            u, v,
+            lambda: self.apply(in_operator.f, params, lazy),
+            lambda: self.apply(in_operator.g, params, lazy)
+        )
+
+    def visit_projection(self, projection: Projection):
+        start = projection.left
+        stop = start + projection.f.arity
+        lazy = frozenset(i - start for i in self.lazy if start <= i < stop)
+        self.result = self.apply(projection.f, self.params[start:stop], lazy)
+
+    def visit_composition(self, composition: Composition):
+        params, lazy = self.params, self.lazy
+        f = composition.f
+        used, strict = self.used.of(f), self.strict.of(f)
+
+        def argument(i: int) -> int:
+            g = composition.g[i]
+            if i in strict:
+                return self.apply(g, params, lazy)
+            d = self._register()
+            if i in used:
+                self._op(PROMISE, d, self.function(g, lazy), len(params), *params)
+            return d
+
+        if isinstance(f, IfThenElse):
+            # Only the chosen branch is computed, the condition neither when
+            # the Interpreter skips it, for the same compounds.
+            x, y, u, v = composition.g
+            if x is y:
+                self.result = self.apply(x, params, lazy)
+            elif u is v:
+                self.result = self.apply(y, params, lazy)
+            else:
+                self.result = self._branch(
+                    self.apply(u, params, lazy), self.apply(v, params, lazy),
+                    lambda: self.apply(x, params, lazy),
+                    lambda: self.apply(y, params, lazy)
+                )
+            return
+        arguments = [argument(i) for i in range(len(composition.g))]
+        self.result = self.apply(f, arguments, used - strict)
+
+    def visit_recursion(self, recursion: Recursion):
+        params, lazy = self.params, self.lazy
+        used = self.used.of(recursion.g)
+        if 0 not in used:
+            # The recursive calls are never needed.
+            none = self._register()
+            self.result = self.apply(recursion.g, [none, *params],
+                                     frozenset(i + 1 for i in lazy))
+            return
+        # The arguments are the keys of the memoized values, they are all
+        # computed, the unused ones are left empty.
+        arguments = []
+        for i in range(recursion.arity):
+            if i == 0 or i + 1 in used:
+                arguments.append(self._read(i))
+            else:
+                arguments.append(self._register())
+        d, k = self._register(), self._recursion(recursion)
+        self._op(RECURSE, d, k, len(arguments), *arguments)
+        self.result = d
+
+    def _recursion(self, recursion: Recursion) -> int:
+        if recursion in self.recursion_index:
+            return self.recursion_index[recursion]
+        k = self.recursion_index[recursion] = len(self.recursions)
+        self.recursions.append((-1, -1))
+        step = self.function(recursion.g, frozenset((0,)))
+
+        def union():
+            z, *x = range(recursion.arity)
+            elements, accumulator = self._register(), self._register()
+            e, value = self._register(), self._register()
+            self._op(ELEMENTS, elements, z)
+            self._op(EMPTY, accumulator)
+            loop = len(self.instructions)
+            end = self._op(NEXT, e, elements, -1)
+            self._op(RECURSE, value, k, recursion.arity, e, *x)
+            self._op(UNION, accumulator, accumulator, value)
+            self._op(JUMP, loop)
+            self.instructions[end] = len(self.instructions)
+            self._op(RETURN, accumulator)
+        self.recursions[k] = (step, self._code(recursion.arity, union))
+        return k
+
+    def visit_union(self, union: Union):
+        params = self.params
+        elements, accumulator = self._register(), self._register()
+        e = self._register()
+        self._op(ELEMENTS, elements, self._read(0))
+        self._op(EMPTY, accumulator)
+        loop = len(self.instructions)
+        end = self._op(NEXT, e, elements, -1)
+        value = self.apply(union.h, [e, *params[1:]], frozenset())
+        self._op(UNION, accumulator, accumulator, value)
+        self._op(JUMP, loop)
+        self.instructions[end] = len(self.instructions)
+        self.result = accumulator
+
+    def visit_merge(self, merge: Merge):
+        accumulator = self._register()
+        self._op(EMPTY, accumulator)
+        for i in range(len(self.params)):
+            self._op(UNION, accumulator, accumulator, self._read(i))
+        self.result = accumulator
+
+
+class Promise:
+    """Argument computed by a function the first time it is forced."""
+    __slots__ = ['function', 'arguments', 'value', 'done']
+
+    def __init__(self, function: int, arguments: Sequence):
+        self.function = function
+        self.arguments = arguments
+        self.done = False
+
+
+class AtomicInstructionCounter(Observer):
+    """Counts the instructions building or testing sets."""
+
+    def init(self):
+        self.steps = 0
+
+    def notify(self):
+        if self.interpreter.opcode in (EMPTY, ADJOIN, UNION, BRANCH):
+            self.steps += 1
+
+
+_END = object()
+
+
+class VirtualMachine:
+    """
+    Runs Bytecode with an explicit stack of frames, each one holding its
+    registers. Observers are notified before every instruction, the opcode
+    of which is in the opcode attribute.
+    """
+
+    def __init__(self, bytecode: Bytecode, arena: Optional[SetArena] = None):
+        self.bytecode = bytecode
+        self.sets = SetOperations() if arena is None else arena
+        self.observers: List[Observer] = []
+        self.memos: List[Dict[Tuple, Any]] = [{} for _ in bytecode.recursions]
+        self.opcode = -1
+
+    @classmethod
+    def from_node(cls, node: Node, arena: Optional[SetArena] = None) -> 'VirtualMachine':
+        return cls(Assembler().assemble(node), arena)
+
+    def add_observer(self, observer: Observer) -> None:
+        observer.setup(self)
+        self.observers.append(observer)
+
+    def clear_cache(self):
+        for memo in self.memos:
+            memo.clear()
+
+    def interpret(self, *args: Argument) -> Any:
+        if len(args) != self.bytecode.arity:
+            raise MismatchedNumberOfArguments(self.bytecode.arity, len(args))
+        return self.run(parse_arguments(self.sets, *args))
+
+    def evaluate(self, *values: Any) -> Any:
+        if len(values) != self.bytecode.arity:
+            raise MismatchedNumberOfArguments(self.bytecode.arity, len(values))
+        return self.run(values)
+
+    def run(self, args: Sequence) -> Any:
+        for observer in self.observers:
+            observer.init()
+        try:
+            return self._run(args)
+        finally:
+            for observer in self.observers:
+                observer.done()
+
+    def _run(self, args: Sequence) -> Any:
+        codes, recursions, memos = self.bytecode.codes, self.bytecode.recursions, self.memos
+        sets = self.sets
+        empty, adjoin, union = sets.empty(), sets.adjoin, sets.union
+        contains, elements = sets.contains, sets.elements
+        observers = self.observers
+        # Saved frames: instructions, registers, return address, register
+        # of the result and what the result completes, a Promise or a memo.
+        frames: List[tuple] = []
+        code = codes[0]
+        ins = code.instructions
+        regs = [None] * code.size
+        regs[:len(args)] = args
+        pc = 0
+        while True:
+            op = ins[pc]
+            if observers:
+                self.opcode = op
+                for observer in observers:
+                    observer.notify()
+            if op == ADJOIN:
+                regs[ins[pc + 1]] = adjoin(regs[ins[pc + 2]], regs[ins[pc + 3]])
+                pc += 4
+            elif op == MOVE:
+                regs[ins[pc + 1]] = regs[ins[pc + 2]]
+                pc += 3
+            elif op == BRANCH:
+                pc = pc + 4 if contains(regs[ins[pc + 2]], regs[ins[pc + 1]]) else ins[pc + 3]
+            elif op == JUMP:
+                pc = ins[pc + 1]
+            elif op == FORCE:
+                r = ins[pc + 1]
+                pc += 2
+                promise = regs[r]
+                if type(promise) is Promise:
+                    if promise.done:
+                        regs[r] = promise.value
+                    else:
+                        frames.append((ins, regs, pc, r, promise))
+                        code = codes[promise.function]
+                        ins = code.instructions
+                        regs = [None] * code.size
+                        regs[:len(promise.arguments)] = promise.arguments
+                        pc = 0
+            elif op == CALL or op == PROMISE:
+                d, f, n = ins[pc + 1], ins[pc + 2], ins[pc + 3]
+                arguments = [regs[a] for a in ins[pc + 4:pc + 4 + n]]
+                pc += 4 + n
+                if op == PROMISE:
+                    regs[d] = Promise(f, arguments)
+                else:
+                    frames.append((ins, regs, pc, d, None))
+                    code = codes[f]
+                    ins = code.instructions
+                    regs = [None] * code.size
+                    regs[:n] = arguments
+                    pc = 0
+            elif op == RECURSE:
+                d, k, n = ins[pc + 1], ins[pc + 2], ins[pc + 3]
+                key = tuple([regs[a] for a in ins[pc + 4:pc + 4 + n]])
+                pc += 4 + n
+                memo = memos[k]
+                value = memo.get(key, _END)
+                if value is not _END:
+                    regs[d] = value
+                else:
+                    step, merge = recursions[k]
+                    frames.append((ins, regs, pc, d, (memo, key)))
+                    code = codes[step]
+                    ins = code.instructions
+                    regs = [None] * code.size
+                    regs[0] = Promise(merge, key)
+                    regs[1:n + 1] = key
+                    pc = 0
+            elif op == EMPTY:
+                regs[ins[pc + 1]] = empty
+                pc += 2
+            elif op == UNION:
+                regs[ins[pc + 1]] = union(regs[ins[pc + 2]], regs[ins[pc + 3]])
+                pc += 4
+            elif op == ELEMENTS:
+                regs[ins[pc + 1]] = iter(elements(regs[ins[pc + 2]]))
+                pc += 3
+            elif op == NEXT:
+                e = next(regs[ins[pc + 2]], _END)
+                if e is _END:
+                    pc = ins[pc + 3]
+                else:
+                    regs[ins[pc + 1]] = e
+                    pc += 4
+            else:
+                value = regs[ins[pc + 1]]
+                if not frames:
+                    return value
+                ins, regs, pc, d, target = frames.pop()
+                regs[d] = value
+                if type(target) is Promise:
+                    target.value = value
+                    target.done = True
+                    target.arguments = None
+                elif target is not None:
+                    memo, key = target
+                    memo[key] = value
+
+    def __str__(self):
+        return f'VirtualMachine({len(self.bytecode.codes)} functions)'
+
+    __repr__ = __str__